@@ -5,16 +5,10 @@ This AWS Lambda function allowed to delete the old Elasticsearch index
 """
 import sys
 
-import boto3
 import datetime
 import json
 import os
 import yaml
-from botocore.auth import SigV4Auth
-from botocore.awsrequest import AWSRequest
-from botocore.credentials import create_credential_resolver
-from botocore.session import get_session
-from botocore.vendored.requests import Session
 from retrying import retry
 if sys.version_info[0] == 3:
     from urllib.request import quote
@@ -22,6 +16,7 @@ else:
     from urllib import quote
 
 from dcplib.aws_secret import AwsSecret
+from lib import aws_es
 
 infra_config = json.loads(AwsSecret('logs/_/config.json').value)
 
@@ -54,8 +49,7 @@ class ESCleanup(object):
         self.context = context
 
         self.cfg = {}
-        self.cfg["es_endpoint"] = boto3.client('es') \
-            .describe_elasticsearch_domain(DomainName=infra_config['es_domain_name'])['DomainStatus']['Endpoint']
+        self.cfg["es_endpoint"] = aws_es.get_endpoint(infra_config['es_domain_name'])
         self.cfg["index"] = [index.get("prefix") for index in cluster_config.get('indices')]
 
         self.cfg["index_format"] = cluster_config.get('index_format')
@@ -84,21 +78,13 @@ class ESCleanup(object):
         if not path.startswith("/"):
             path = "/" + path
 
-        es_region = self.cfg["es_endpoint"].split(".")[1]
+        es_region = aws_es.get_region(self.cfg["es_endpoint"])
 
-        req = AWSRequest(
-            method=method,
-            url="https://%s%s?pretty&format=json" % (self.cfg["es_endpoint"], quote(path)),
+        res = aws_es.get_http_session().request(
+            method,
+            "https://%s%s?pretty&format=json" % (self.cfg["es_endpoint"], quote(path)),
             data=payload,
-            headers={'Host': self.cfg["es_endpoint"]})
-        credential_resolver = create_credential_resolver(get_session())
-        credentials = credential_resolver.load_credentials()
-        SigV4Auth(credentials, 'es', es_region).add_auth(req)
-
-        preq = req.prepare()
-        session = Session()
-        res = session.send(preq)
-        session.close()
+            auth=aws_es.get_auth(es_region))
         if res.status_code >= 200 and res.status_code <= 299:
             return json.loads(res.content)
         else:
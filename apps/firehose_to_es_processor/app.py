@@ -30,19 +30,32 @@ The data is additionally compressed with GZIP.
 
 The code will:
 
-1) Retrieve the file from S3
+1) Retrieve the file from S3, as concurrent ranged GETs prefetched ahead of the parser
 2) Gunzip and parse the s3 file into individual records
-3) Process/Transform each record and its corresponding log events
-4) Bulk send the transformed events to the corresponding elastic search endpoing with today's index
-5) Delete the file from s3 after successful processing and post to ES
+3) Process/Transform each record and its corresponding log events, optionally in several worker processes
+4) Bulk send the transformed events to the corresponding elastic search endpoing, each to the daily index of its
+   timestamp, in requests cut to an exact serialized size with several in flight at once
+5) Write documents ES rejected permanently to the dead letter prefix of the bucket
+6) Delete the file from s3 after successful processing and post to ES
 """
+import json
 import logging
-import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
 
 from lib import firehose_records
 from lib.airbrake_notifier import AirbrakeNotifier
-from lib.cloudwatch_notifier import observe_counts
+from lib.bulk_indexer import BulkIndexer
+from lib.bulk_request import BulkRequest
+from lib.cloudwatch_notifier import MetricsBuffer, observe_counts
+from lib.dead_letters import DeadLetters
+from lib.json_object_stream import JsonBytesObjectStream
 from lib.s3_client import S3Client
+from lib.s3_prefetch_reader import S3PrefetchReader
+from lib.timing import StageTimer, percentile
+from lib.transform_pool import TransformPool
 from lib.es_client import ESClient
 from lib.secrets import config
 
@@ -50,56 +63,180 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 AIRBRAKE_ENABLED = config['airbrake_enabled']
+ES_BULK_MAX_BYTES = config.get('es_bulk_max_bytes', BulkRequest.MAX_BYTES)
+ES_BULK_MAX_DOCS = config.get('es_bulk_max_docs', BulkRequest.MAX_DOCS)
+ES_BULK_CONCURRENCY = config.get('es_bulk_concurrency', BulkIndexer.DEFAULT_CONCURRENCY)
+ES_DOCUMENT_ID = config.get('es_document_id')
+ES_OP_TYPE = config.get('es_op_type', 'index')
+ES_DEAD_LETTER_PREFIX = config.get('es_dead_letter_prefix', 'dead-letter/')
+ES_DEAD_LETTER_PATH = config.get('es_dead_letter_path')
+FILE_CONCURRENCY = config.get('file_concurrency', 2)
+S3_PREFETCH_PART_SIZE = config.get('s3_prefetch_part_size', S3PrefetchReader.PART_SIZE)
+S3_PREFETCH_DEPTH = config.get('s3_prefetch_depth', S3PrefetchReader.DEPTH)
+TRANSFORM_PROCESSES = config.get('transform_processes', 0)
+METRICS_PUBLISHER = config.get('metrics_publisher', 'emf')
+STAGE_METRICS_ENABLED = config.get('stage_metrics_enabled', False)
+
+# innermost first, each stage pulling from the one before it
+PIPELINE_STAGES = ['fetch', 'gunzip', 'split', 'transform', 'bulk_build', 'bulk_post']
+
+metrics = MetricsBuffer(publisher=METRICS_PUBLISHER)
+
+
+class FileProcessingError(Exception):
+    pass
 
 
 def handler(event, context):
-    """Main function"""
+    """Main function
+
+    The files of the event are processed by up to FILE_CONCURRENCY workers sharing one S3Client per bucket and one
+    ESClient. A file that fails is left in the bucket without affecting the others; once every file is done the
+    failures are raised together so Lambda retries the event, and files deleted by the previous attempt are skipped.
+    """
+    s3_clients = dict()
+    results = []
+    files = []
     for record in event['Records']:
         region = record['awsRegion']
         bucket = record['s3']['bucket']['name']
-        s3_client = S3Client(region, bucket)
         s3_object_key = record['s3']['object']['key']
-        logger.info(f"Loading from s3 file {s3_object_key}")
-        file = s3_client.retrieve_file(s3_object_key)['Body']
-
-        doc_stream = s3_client.unzip_and_parse_firehose_file(file)
-        log_event_stream = firehose_records.from_docs(doc_stream)
+        if s3_object_key.startswith(ES_DEAD_LETTER_PREFIX):
+            logger.info(f"Skipping dead letter file {s3_object_key}")
+            results.append(dict(s3_object_key=s3_object_key, status='skipped'))
+            continue
+        if (region, bucket) not in s3_clients:
+            s3_clients[(region, bucket)] = S3Client(region, bucket)
+        files.append((s3_clients[(region, bucket)], s3_object_key))
+
+    if files:
+        es_client = ESClient()
+        es_client.put_index_template()
+        with ThreadPoolExecutor(max_workers=min(FILE_CONCURRENCY, len(files))) as executor:
+            results += executor.map(lambda file: _process_file(file[0], es_client, file[1]), files)
+        if AIRBRAKE_ENABLED:
+            AirbrakeNotifier.flush()
+        metrics.flush()
+
+    failures = [result for result in results if result['status'] == 'failed']
+    if failures:
+        raise FileProcessingError("Failed to process {} of {} files: {}".format(
+            len(failures),
+            len(results),
+            ", ".join(f"{result['s3_object_key']} ({result['error']})" for result in failures)
+        ))
+    return dict(results=results)
+
+
+def _process_file(s3_client, es_client, s3_object_key):
+    try:
+        return process_file(s3_client, es_client, s3_object_key)
+    except Exception as e:
+        if isinstance(e, ClientError) and e.response['Error']['Code'] == 'NoSuchKey':
+            logger.info(f"Skipping s3 file {s3_object_key}, already processed")
+            return dict(s3_object_key=s3_object_key, status='skipped')
+        logger.exception(f"Failed to process s3 file {s3_object_key}")
+        return dict(s3_object_key=s3_object_key, status='failed', error=str(e))
+
+
+def process_file(s3_client, es_client, s3_object_key):
+    """Indexes one Firehose file and deletes it from the bucket, returning its result."""
+    logger.info(f"Loading from s3 file {s3_object_key}")
+    started = time.perf_counter()
+    timer = StageTimer()
+    with s3_client.open_file(s3_object_key, S3_PREFETCH_PART_SIZE, S3_PREFETCH_DEPTH) as file:
+        file = timer.timed_reader('fetch', file)
+        chunks = timer.timed_iter('gunzip', s3_client.gunzip_chunks(file), size=len)
 
         notifier = None
         if AIRBRAKE_ENABLED:
             notifier = AirbrakeNotifier()
-            log_event_stream = notifier.notify_on_stream(log_event_stream)
-
-        es_client = ESClient()
-        es_client.create_cwl_day_index()
-
-        current_stream_size = 0
-        batch = []
-        total_lines = 0
-        # buffer up to 25MB at a time and then submit to Elasticsearch
-        for log_event in log_event_stream:
-            current_stream_size += sys.getsizeof(log_event)
-            batch.append(log_event)
-            total_lines += 1
-            if current_stream_size > 25000000:
-                es_client.bulk_post(batch)
-                current_stream_size = 0
-                batch = []
-
-        if len(batch) > 0:
-            es_client.bulk_post(batch)
 
+        if ES_DEAD_LETTER_PATH:
+            dead_letters = DeadLetters.to_file(ES_DEAD_LETTER_PATH)
+        else:
+            dead_letters = DeadLetters.to_s3(s3_client, ES_DEAD_LETTER_PREFIX)
+        bulk_indexer = BulkIndexer(es_client, ES_BULK_CONCURRENCY, dead_letters)
+
+        if TRANSFORM_PROCESSES:
+            notifier_factory = AirbrakeNotifier if notifier else None
+            with TransformPool(TRANSFORM_PROCESSES, ES_DOCUMENT_ID, ES_OP_TYPE, "cwl", notifier_factory) as pool:
+                # splitting happens in the transform stage, as records are handed out to the workers
+                lines = timer.timed_iter('transform', pool.transform(chunks))
+                bulk_requests = timer.timed_iter(
+                    'bulk_build', BulkRequest.from_lines(lines, ES_BULK_MAX_BYTES, ES_BULK_MAX_DOCS))
+                stats = bulk_indexer.index(bulk_requests)
+            if notifier:
+                for worker_notifier in pool.notifiers:
+                    notifier.merge(worker_notifier)
+        else:
+            doc_stream = timer.timed_iter('split', JsonBytesObjectStream(chunks))
+            log_event_stream = firehose_records.from_docs(doc_stream)
+            if notifier:
+                log_event_stream = notifier.notify_on_stream(log_event_stream)
+            log_event_stream = timer.timed_iter('transform', log_event_stream)
+            bulk_requests = timer.timed_iter('bulk_build', BulkRequest.from_docs(
+                log_event_stream, ES_BULK_MAX_BYTES, ES_BULK_MAX_DOCS, ES_DOCUMENT_ID, ES_OP_TYPE, index_prefix="cwl"))
+            stats = bulk_indexer.index(bulk_requests)
+        timer.add('bulk_post', stats.elapsed)
+
+    with timer.timed('dead_letters'):
+        dead_letters.flush(s3_object_key)
+    with timer.timed('delete'):
         s3_client.delete_file(s3_object_key)
 
-        if notifier:
-            report = notifier.report()
-            observe_counts(report)
-            for log_group, counts in notifier._report.items():
-                logger.info("Observed log group {}: {} total, {} errors".format(
-                        log_group,
-                        counts['total'],
-                        counts['errors']
-                    )
+    if notifier:
+        notifier.notify_errors()
+        report = notifier.report()
+        observe_counts(report, metrics)
+        for log_group, counts in notifier._report.items():
+            logger.info("Observed log group {}: {} total, {} errors".format(
+                    log_group,
+                    counts['total'],
+                    counts['errors']
                 )
-
-        logger.info("Indexed {} log events".format(total_lines))
+            )
+
+    logger.info("Indexed {} of {} log events from {} ({} already indexed) in {} bulk requests, {:.0f} docs/sec, "
+                "{} retried, {} failed".format(
+        stats.num_indexed,
+        stats.num_docs,
+        s3_object_key,
+        stats.num_existing,
+        stats.num_requests,
+        stats.docs_per_second,
+        stats.num_retried,
+        stats.num_failed
+    ))
+    _report_timings(s3_object_key, timer, stats, time.perf_counter() - started)
+    return dict(s3_object_key=s3_object_key, status='processed', num_docs=stats.num_docs,
+                num_indexed=stats.num_indexed, num_failed=stats.num_failed)
+
+
+def _report_timings(s3_object_key, timer, stats, elapsed):
+    """Logs the time spent in each stage of processing a file as one JSON line, and adds it to the metrics if
+    STAGE_METRICS_ENABLED."""
+    seconds = timer.exclusive(PIPELINE_STAGES)
+    seconds['dead_letters'] = timer.seconds['dead_letters']
+    seconds['delete'] = timer.seconds['delete']
+    p50 = percentile(stats.latencies, 50)
+    p99 = percentile(stats.latencies, 99)
+    docs_per_second = stats.num_docs / elapsed if elapsed else 0.0
+    logger.info(json.dumps({
+        's3_object_key': s3_object_key,
+        'seconds': {stage: round(value, 4) for stage, value in seconds.items()},
+        'total_seconds': round(elapsed, 4),
+        'compressed_bytes': timer.sizes['fetch'],
+        'bytes': timer.sizes['gunzip'],
+        'events': stats.num_docs,
+        'bulk_requests': stats.num_requests,
+        'docs_per_second': round(docs_per_second, 1),
+        'bulk_latency_p50': round(p50, 4) if p50 is not None else None,
+        'bulk_latency_p99': round(p99, 4) if p99 is not None else None,
+    }))
+    if STAGE_METRICS_ENABLED:
+        for stage, value in seconds.items():
+            metrics.add('Stage Time', [('Stage', stage)], value, 'Seconds')
+        metrics.add('Docs Per Second', [], docs_per_second, 'Count/Second')
+        for latency in stats.latencies:
+            metrics.add('Bulk Latency', [], latency, 'Seconds')
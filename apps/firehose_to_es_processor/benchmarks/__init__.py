@@ -0,0 +1,58 @@
+import json
+import random
+import time
+from contextlib import contextmanager
+
+MESSAGE_SHAPES = [
+    'START RequestId: 0b7ab9d3-2d3b-4c1c-9c73-7a4f0e3c1f0e Version: $LATEST',
+    'INFO 2018-06-08T00:00:00Z GET /v1/bundles/7ef8966b-45ef-4e0a-a51b-44a865372050?version=2018-06-08T230333.785338Z',
+    '{"level": "INFO", "message": "request handled", "status": 200, "duration_ms": 12.5}',
+    '2018-06-08 00:00:00,000 - app - ERROR - {"error": "not found", "uuid": "7ef8966b", "path": "/v1/files"}',
+    '[WARNING] {"error": "truncated", "detail": "payload was cut sho',
+    'Traceback (most recent call last):\n  File "app.py", line 12, in handler\nKeyError: \'Records\'',
+]
+
+
+def firehose_doc(num_events, log_group='/aws/lambda/benchmark', start_ms=1519970297000, seed=0):
+    """A DATA_MESSAGE record shaped like the ones CloudWatch Logs subscription filters send to Firehose."""
+    rand = random.Random(seed)
+    return {
+        'messageType': 'DATA_MESSAGE',
+        'owner': '123456789012',
+        'logGroup': log_group,
+        'logStream': '2018/06/08/[$LATEST]0123456789abcdef',
+        'subscriptionFilters': ['firehose'],
+        'logEvents': [
+            {
+                'id': str(35000000000000000000000000000000000000000000000000000000 + i),
+                'timestamp': start_ms + i * 7,
+                'message': rand.choice(MESSAGE_SHAPES)
+            } for i in range(num_events)
+        ]
+    }
+
+
+def firehose_file(num_bytes, events_per_doc=100):
+    """Concatenated JSON documents, without separators, as Firehose writes them to S3."""
+    docs = []
+    size = 0
+    seed = 0
+    while size < num_bytes:
+        doc = json.dumps(firehose_doc(events_per_doc, seed=seed))
+        docs.append(doc)
+        size += len(doc)
+        seed += 1
+    return ''.join(docs)
+
+
+@contextmanager
+def timed(label, num_bytes=None, num_items=None, unit='items'):
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    rates = [f"{elapsed:.3f}s"]
+    if num_bytes is not None:
+        rates.append(f"{num_bytes / elapsed / 1e6:.1f} MB/s")
+    if num_items is not None:
+        rates.append(f"{num_items / elapsed:,.0f} {unit}/s")
+    print(f"{label:<40} {'  '.join(rates)}")
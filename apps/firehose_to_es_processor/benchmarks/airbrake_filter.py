@@ -0,0 +1,56 @@
+"""
+Events/sec of AirbrakeFilter against the previous whitelist and blacklist regex searches, which also formatted the
+notification of every error, including those after the per file notifications were exhausted.
+
+    python -m benchmarks.airbrake_filter [num_events]
+"""
+import re
+import sys
+
+from benchmarks import firehose_doc, timed
+from lib.airbrake_filter import AirbrakeFilter
+from lib.firehose_record import FirehoseRecord
+
+# as in scripts/secret_templates.py
+WHITELISTED_TERMS = ['stacktrace', 'traceback', 'error', 'exception', 'critical']
+BLACKLISTED_STRINGS = ['Machine-readable error code', 'validation_errors', 'error_summary_metrics',
+                       'cannot find the current segment']
+BLACKLISTED_LOG_GROUPS = ['/aws/cloudtrail/audit-and-data-access']
+
+
+class RegexFilter:
+    """The classification AirbrakeNotifier.notify did before AirbrakeFilter."""
+
+    whitelist = re.compile('|'.join(WHITELISTED_TERMS), re.IGNORECASE)
+    blacklist = re.compile('|'.join(BLACKLISTED_STRINGS))
+    blacklisted_log_groups = set(BLACKLISTED_LOG_GROUPS)
+
+    def notify(self, log_event):
+        message = log_event['@message']
+        log_group = log_event['@log_group']
+        error_str = None
+        if log_group not in self.blacklisted_log_groups and self.whitelist.search(message) and \
+                not self.blacklist.search(message):
+            error_str = "'{0} {1} '@log_stream': {2}".format(log_group, message, log_event['@log_stream'])
+        return error_str
+
+
+class CountingFilter:
+
+    error_filter = AirbrakeFilter(WHITELISTED_TERMS, BLACKLISTED_STRINGS, BLACKLISTED_LOG_GROUPS)
+
+    def notify(self, log_event):
+        return self.error_filter.is_error(log_event['@message'], log_event['@log_group'])
+
+
+def main(num_events=1000000):
+    log_events = list(FirehoseRecord(firehose_doc(num_events)).transform_and_extract_from_log_events_in_record())
+    for label, notifier in [('regex whitelist and blacklist', RegexFilter()),
+                            ('AirbrakeFilter', CountingFilter())]:
+        with timed(label, num_items=num_events, unit='events'):
+            errors = sum(1 for log_event in log_events if notifier.notify(log_event))
+        print(f"{'':<40} {errors:,} errors")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
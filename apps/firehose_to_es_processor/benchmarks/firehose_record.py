@@ -0,0 +1,49 @@
+"""
+Events/sec of FirehoseRecord against the previous per-event envelope and local-time strftime transform.
+
+    python -m benchmarks.firehose_record [num_events]
+"""
+import json
+import sys
+from datetime import datetime
+
+from benchmarks import firehose_doc, timed
+from lib.firehose_record import FirehoseRecord
+from lib.util import extract_json
+
+
+class PerEventFirehoseRecord(FirehoseRecord):
+    """The transform FirehoseRecord replaced, rebuilding the envelope and timestamp for every event."""
+
+    def _transform_and_extract_from_log_event(self, log_event):
+        timestamp_in_seconds = log_event["timestamp"] / 1000.0
+        transformed_timestamp = datetime.fromtimestamp(timestamp_in_seconds).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+        transformed_payload = {
+            "@message": log_event["message"],
+            "@id": log_event["id"],
+            "@timestamp": transformed_timestamp,
+            "@owner": self.record["owner"],
+            "@log_group": self.record["logGroup"],
+            "@log_stream": self.record["logStream"]
+        }
+        transformed_message = extract_json(log_event["message"])
+        if transformed_message and type(transformed_message) == dict:
+            transformed_message.pop('_index', None)
+            transformed_message.pop('index', None)
+            for k, v in transformed_message.items():
+                if FirehoseRecord.invalid_chars.search(k) is None:
+                    transformed_payload[k] = json.dumps(v)
+        return transformed_payload
+
+
+def main(num_events=100000):
+    doc = firehose_doc(num_events)
+    for label, record_class in [('per-event envelope', PerEventFirehoseRecord),
+                                ('shared envelope', FirehoseRecord)]:
+        with timed(label, num_items=num_events, unit='events'):
+            for _ in record_class(doc).transform_and_extract_from_log_events_in_record():
+                pass
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,55 @@
+"""
+Throughput of JsonObjectStream against the previous character-at-a-time splitter.
+
+    python -m benchmarks.json_object_stream [size_in_mb]
+"""
+import io
+import json
+import sys
+
+from benchmarks import firehose_file, timed
+from lib.json_object_stream import JsonObjectStream
+
+
+class CharacterJsonObjectStream:
+    """The splitter JsonObjectStream replaced, reading one character per call."""
+
+    def __init__(self, reader):
+        self.reader = reader
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        brackets = 0
+        slash_active = False
+        quotes_active = False
+        result = []
+        while True:
+            c = self.reader.read(1)
+            if c == '':
+                raise StopIteration()
+            result += [c]
+            if c == '"':
+                quotes_active = quotes_active if slash_active else (not quotes_active)
+            if c == '{':
+                brackets += 0 if quotes_active else 1
+            if c == '}':
+                brackets += 0 if quotes_active else -1
+                if brackets == 0:
+                    return json.loads(''.join(result))
+            slash_active = (not slash_active) if c == "\\" else False
+
+
+def main(size_in_mb=20):
+    data = firehose_file(size_in_mb * 1000 * 1000)
+    num_bytes = len(data.encode('utf-8'))
+    for label, stream_class in [('character JsonObjectStream', CharacterJsonObjectStream),
+                                ('chunked JsonObjectStream', JsonObjectStream)]:
+        with timed(label, num_bytes=num_bytes):
+            count = sum(1 for _ in stream_class(io.StringIO(data)))
+        print(f"{'':<40} {count} objects")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,25 @@
+"""
+Gunzip and split throughput of the text and bytes parsing paths of S3Client.
+
+    python -m benchmarks.s3_client [size_in_mb]
+"""
+import gzip
+import io
+import sys
+
+from benchmarks import firehose_file, timed
+from lib.s3_client import S3Client
+
+
+def main(size_in_mb=20):
+    data = firehose_file(size_in_mb * 1000 * 1000).encode('utf-8')
+    compressed = gzip.compress(data)
+    for label, parse in [('unzip_and_parse_firehose_file (text)', S3Client.unzip_and_parse_firehose_file),
+                         ('stream_firehose_file (bytes)', S3Client.stream_firehose_file)]:
+        with timed(label, num_bytes=len(data)):
+            count = sum(1 for _ in parse(io.BytesIO(compressed)))
+        print(f"{'':<40} {count} objects")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
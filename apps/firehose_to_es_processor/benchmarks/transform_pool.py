@@ -0,0 +1,37 @@
+"""
+Events/sec of the decode and transform stage in the calling process against a TransformPool of 1 to N workers.
+
+    python -m benchmarks.transform_pool [num_megabytes] [max_processes]
+
+Only scales where the Lambda has more than one vCPU, i.e. with memory_size above 1792MB.
+"""
+import multiprocessing
+import sys
+
+from benchmarks import firehose_file, timed
+from lib import firehose_records
+from lib.bulk_request import BulkRequest
+from lib.json_object_stream import JsonBytesObjectStream
+from lib.transform_pool import TransformPool
+
+CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def main(num_megabytes=32, max_processes=multiprocessing.cpu_count()):
+    data = firehose_file(num_megabytes * 1000 * 1000).encode('utf-8')
+    chunks = [data[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE)]
+    num_events = sum(1 for _ in firehose_records.from_docs(JsonBytesObjectStream(chunks)))
+
+    with timed('in process', len(data), num_events, 'events'):
+        log_event_stream = firehose_records.from_docs(JsonBytesObjectStream(chunks))
+        for _ in BulkRequest.to_lines(log_event_stream, 'hash', 'create', 'cwl'):
+            pass
+    for processes in range(1, max_processes + 1):
+        with TransformPool(processes, 'hash', 'create', 'cwl') as pool:
+            with timed(f'{processes} worker processes', len(data), num_events, 'events'):
+                for _ in pool.transform(chunks):
+                    pass
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,41 @@
+"""
+Throughput of extract_json against the previous bounds-scanning extractor, per CloudWatch message shape.
+
+    python -m benchmarks.util [num_messages]
+"""
+import json
+import sys
+
+from benchmarks import MESSAGE_SHAPES, timed
+from lib.util import extract_json, extract_json_bounds
+
+CORPUS = {
+    'plain text': [MESSAGE_SHAPES[0], MESSAGE_SHAPES[1], MESSAGE_SHAPES[5]],
+    'pure json': [MESSAGE_SHAPES[2]],
+    'json with prefix': [MESSAGE_SHAPES[3]],
+    'truncated json': [MESSAGE_SHAPES[4]],
+}
+
+
+def bounds_extract_json(message):
+    """The extractor extract_json replaced, scanning every character for brace bounds."""
+    beginning_index, end_index = extract_json_bounds(message)
+    if beginning_index is not None and end_index is not None:
+        try:
+            return json.loads(message[beginning_index:end_index + 1])
+        except Exception:
+            return {}
+    return {}
+
+
+def main(num_messages=200000):
+    for shape, messages in CORPUS.items():
+        corpus = [messages[i % len(messages)] for i in range(num_messages)]
+        for label, extract in [('bounds', bounds_extract_json), ('extract_json', extract_json)]:
+            with timed(f"{shape}: {label}", num_items=num_messages, unit='messages'):
+                for message in corpus:
+                    extract(message)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,54 @@
+import re
+
+_REGEX_SPECIAL_CHARS = set('.^$*+?{}[]\\|()')
+
+
+class AirbrakeFilter:
+    """Decides which log messages are errors worth notifying Airbrake of, compiled once from the secrets config.
+
+    A message is an error if it contains a whitelisted term, ignoring case, and no blacklisted string, and it
+    does not come from a blacklisted log group. Terms and strings are regular expressions, but in practice they are
+    plain words, and substring search on the lowercased message is several times faster than searching with a
+    case-insensitive regex alternation. Literal terms are therefore matched with `in`, and only terms that really
+    are regular expressions go into a combined pattern. An empty list matches nothing.
+    """
+
+    def __init__(self, whitelisted_terms, blacklisted_strings=(), blacklisted_log_groups=()):
+        whitelisted_literals, self.whitelisted_regex = self._compile(whitelisted_terms, re.IGNORECASE)
+        # only literals are lowercased, lowercasing an expression would change escapes such as \S into \s
+        self.whitelisted_literals = tuple(term.lower() for term in whitelisted_literals)
+        self.blacklisted_literals, self.blacklisted_regex = self._compile(blacklisted_strings)
+        self.blacklisted_log_groups = frozenset(blacklisted_log_groups)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config['airbrake_whitelisted_log_message_terms'],
+            config['airbrake_blacklisted_log_message_strings'],
+            config['airbrake_blacklisted_log_group_names']
+        )
+
+    def is_error(self, message, log_group):
+        return (log_group not in self.blacklisted_log_groups and
+                self.is_whitelisted(message) and
+                not self.is_blacklisted(message))
+
+    def is_whitelisted(self, message):
+        lower = message.lower()
+        for term in self.whitelisted_literals:
+            if term in lower:
+                return True
+        return self.whitelisted_regex is not None and self.whitelisted_regex.search(message) is not None
+
+    def is_blacklisted(self, message):
+        for string in self.blacklisted_literals:
+            if string in message:
+                return True
+        return self.blacklisted_regex is not None and self.blacklisted_regex.search(message) is not None
+
+    @staticmethod
+    def _compile(patterns, flags=0):
+        literals = tuple(p for p in patterns if p and not _REGEX_SPECIAL_CHARS.intersection(p))
+        expressions = [f"(?:{p})" for p in patterns if p and _REGEX_SPECIAL_CHARS.intersection(p)]
+        regex = re.compile('|'.join(expressions), flags) if expressions else None
+        return literals, regex
@@ -1,8 +1,9 @@
-import os
-import re
 import logging
 from airbrake.notifier import Airbrake
 
+from .airbrake_filter import AirbrakeFilter
+from .airbrake_sender import AirbrakeSender
+from .error_fingerprint import ErrorCounts
 from .secrets import config
 
 logger = logging.getLogger(__name__)
@@ -13,15 +14,13 @@ class AirbrakeNotifier:
 
     MAX_NOTIFICATIONS = 50
     airbrake_notifier = Airbrake(project_id=config['airbrake_project_id'], api_key=config['airbrake_api_key'])
-    blacklisted_log_group_names = set(config['airbrake_blacklisted_log_group_names'])
-    blacklisted_log_message_strings_regex = re.compile('|'.join(config["airbrake_blacklisted_log_message_strings"]))
-    whitelisted_log_message_terms_regex_string = "|".join(config['airbrake_whitelisted_log_message_terms'])
-    whitelisted_log_message_terms_regexp = re.compile(whitelisted_log_message_terms_regex_string, re.IGNORECASE)
+    error_filter = AirbrakeFilter.from_config(config)
+    sender = AirbrakeSender(airbrake_notifier)
 
     def __init__(self):
         self._report = dict()
         self._total_errors = 0
-        self._airbrake_rate_limited = False
+        self.errors = ErrorCounts()
 
     def report(self):
         results = []
@@ -30,50 +29,56 @@ class AirbrakeNotifier:
                 results += [(log_group, message_type, count)]
         return results
 
+    def merge(self, other):
+        """Adds the counts and errors of another notifier, such as one that ran in a transform worker."""
+        for log_group, counts in other._report.items():
+            if log_group not in self._report:
+                self._report[log_group] = {
+                    'errors': 0,
+                    'total': 0
+                }
+            self._report[log_group]['errors'] += counts['errors']
+            self._report[log_group]['total'] += counts['total']
+            self._total_errors += counts['errors']
+        self.errors.merge(other.errors)
+
     def notify_on_stream(self, log_event_stream):
         for log_event in log_event_stream:
             self.notify(log_event)
             yield log_event
 
     def notify(self, log_event):
+        """Counts the log event, and its fingerprint if it is an error. Call notify_errors once the stream is done."""
         message = log_event['@message']
         log_group = log_event['@log_group']
-        log_stream = log_event['@log_stream']
-        error_str = None
-        if AirbrakeNotifier._is_message_appropriate_for_airbrake(message, log_group) and \
-                not AirbrakeNotifier._contains_blacklisted_string(message):
+        is_error = AirbrakeNotifier.error_filter.is_error(message, log_group)
+        if is_error:
+            self.errors.add(log_group, message, log_event['@log_stream'])
+        self._observe(log_group, is_error)
+
+    def notify_errors(self):
+        """Queues one notification, with its number of occurrences, for each of the MAX_NOTIFICATIONS most common
+        errors, taken in turn from each log group so a noisy group does not use up the whole budget."""
+        for key, count, log_group, message, log_stream in self.errors.most_common(AirbrakeNotifier.MAX_NOTIFICATIONS):
+            if AirbrakeNotifier.sender.rate_limited:
+                break
             error_str = "'{0} {1} '@log_stream': {2}".format(log_group, message, log_stream)
-            try:
-                if not self._airbrake_rate_limited and self._total_errors < AirbrakeNotifier.MAX_NOTIFICATIONS:
-                    AirbrakeNotifier.airbrake_notifier.notify(error_str)
-            except Exception as e:
-                message = str(e)
-                if message.startswith('420 Client Error'):
-                    self._airbrake_rate_limited = True
-                else:
-                    logger.error("Airbrake notification failed! {}".format(message))
-        self._observe(log_group, error_str)
+            if count > 1:
+                error_str += " ({} occurrences)".format(count)
+            AirbrakeNotifier.sender.send(error_str, key)
+
+    @classmethod
+    def flush(cls):
+        """Waits for the queued notifications to be sent, at the end of an invocation."""
+        cls.sender.flush()
 
-    def _observe(self, log_group, error_str):
+    def _observe(self, log_group, is_error):
         if log_group not in self._report:
             self._report[log_group] = {
                 'errors': 0,
                 'total': 0
             }
-        if error_str:
+        if is_error:
             self._report[log_group]['errors'] += 1
             self._total_errors += 1
         self._report[log_group]['total'] += 1
-
-    @staticmethod
-    def _is_message_appropriate_for_airbrake(message, log_group):
-        if log_group not in AirbrakeNotifier.blacklisted_log_group_names and \
-                AirbrakeNotifier.whitelisted_log_message_terms_regexp.search(message):
-            return True
-        return False
-
-    @staticmethod
-    def _contains_blacklisted_string(message):
-        if AirbrakeNotifier.blacklisted_log_message_strings_regex.search(message):
-            return True
-        return False
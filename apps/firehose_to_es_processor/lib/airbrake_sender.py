@@ -0,0 +1,113 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class AirbrakeSender:
+    """Delivers Airbrake notifications from a background thread, so Airbrake latency does not hold up indexing.
+
+    Notifications are queued without blocking, up to `max_pending`, and dropped beyond that. A notification whose
+    fingerprint was already sent or queued since the last flush is dropped as a duplicate. After Airbrake answers
+    420 the sender is rate limited, and it drops everything until the next flush. Call flush at the end of each
+    invocation, before Lambda freezes the thread.
+
+    Airbrake's notice API takes one notice per request, so notifications are sent one after the other from the
+    queue.
+    """
+
+    MAX_PENDING = 100
+    FLUSH_TIMEOUT = 10
+
+    def __init__(self, airbrake, max_pending=MAX_PENDING):
+        self.airbrake = airbrake
+        self.max_pending = max_pending
+        self.rate_limited = False
+        self.num_sent = 0
+        self.num_duplicates = 0
+        self.num_dropped = 0
+        self._fingerprints = set()
+        self._lock = threading.Lock()
+        self._queue = None
+        self._pid = None
+
+    def send(self, error_str, error_fingerprint):
+        """Queues a notification, returning whether it was queued rather than dropped."""
+        with self._lock:
+            if self.rate_limited:
+                self.num_dropped += 1
+                return False
+            if error_fingerprint in self._fingerprints:
+                self.num_duplicates += 1
+                return False
+            self._start()
+            try:
+                self._queue.put_nowait(error_str)
+            except queue.Full:
+                self.num_dropped += 1
+                return False
+            self._fingerprints.add(error_fingerprint)
+            return True
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """Waits up to timeout seconds for the queued notifications to be sent, then resets deduplication and rate
+        limiting for the next invocation."""
+        with self._lock:
+            pending = self._queue if self._pid == os.getpid() else None
+        if pending is not None:
+            deadline = time.monotonic() + timeout
+            done = threading.Event()
+            try:
+                pending.put(done, timeout=timeout)
+                done.wait(max(deadline - time.monotonic(), 0))
+            except queue.Full:
+                pass
+            if not done.is_set():
+                logger.warning(f"Airbrake notifications still pending after {timeout}s")
+        with self._lock:
+            if self.num_sent or self.num_duplicates or self.num_dropped:
+                logger.info("Sent {} Airbrake notifications, {} duplicates, {} dropped{}".format(
+                    self.num_sent,
+                    self.num_duplicates,
+                    self.num_dropped,
+                    ", rate limited" if self.rate_limited else ""
+                ))
+            self.rate_limited = False
+            self.num_sent = self.num_duplicates = self.num_dropped = 0
+            self._fingerprints.clear()
+
+    def _start(self):
+        # threads do not survive a fork, so a sender inherited by a worker process starts its own
+        if self._pid != os.getpid():
+            self._queue = queue.Queue(self.max_pending)
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, args=(self._queue,), daemon=True).start()
+
+    def _run(self, pending):
+        while True:
+            item = pending.get()
+            if isinstance(item, threading.Event):
+                item.set()
+            elif self.rate_limited:
+                with self._lock:
+                    self.num_dropped += 1
+            else:
+                self._deliver(item)
+
+    def _deliver(self, error_str):
+        try:
+            self.airbrake.notify(error_str)
+            with self._lock:
+                self.num_sent += 1
+        except Exception as e:
+            message = str(e)
+            with self._lock:
+                if message.startswith('420 Client Error'):
+                    self.rate_limited = True
+                else:
+                    self.num_dropped += 1
+                    logger.error("Airbrake notification failed! {}".format(message))
@@ -0,0 +1,56 @@
+"""
+Connections to the logs Amazon Elasticsearch Service domain that are kept for the life of a Lambda container.
+
+The domain endpoint is looked up once, the HTTP session keeps its pooled keep-alive connections between
+invocations, and requests are signed with credentials that botocore refreshes only when they near expiry.
+"""
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+import boto3
+import requests
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
+from botocore.session import get_session
+
+
+@lru_cache(maxsize=None)
+def get_endpoint(domain_name):
+    return boto3.client('es').describe_elasticsearch_domain(DomainName=domain_name)['DomainStatus']['Endpoint']
+
+
+def get_region(endpoint):
+    """The region of a domain endpoint such as search-logs-abc123.us-east-1.es.amazonaws.com"""
+    return endpoint.split(".")[1]
+
+
+@lru_cache(maxsize=None)
+def get_auth(region):
+    return SigV4RequestsAuth(region)
+
+
+@lru_cache(maxsize=None)
+def get_http_session():
+    return requests.Session()
+
+
+class SigV4RequestsAuth(requests.auth.AuthBase):
+    """Signs requests to Amazon Elasticsearch Service with SigV4.
+
+    Credentials are resolved once; for temporary credentials botocore's RefreshableCredentials fetches new ones
+    shortly before they expire, so an instance can be reused across invocations.
+    """
+
+    def __init__(self, region, credentials=None):
+        self.region = region
+        self.credentials = credentials or get_session().get_credentials()
+
+    def __call__(self, request):
+        aws_request = AWSRequest(
+            method=request.method,
+            url=request.url,
+            data=request.body,
+            headers={'Host': urlsplit(request.url).netloc})
+        SigV4Auth(self.credentials.get_frozen_credentials(), 'es', self.region).add_auth(aws_request)
+        request.headers.update(dict(aws_request.headers.items()))
+        return request
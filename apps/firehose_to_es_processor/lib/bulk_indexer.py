@@ -0,0 +1,91 @@
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class BulkIndexStats:
+    """Counts and per-request latencies of the bulk requests posted by a BulkIndexer."""
+
+    def __init__(self):
+        self.num_requests = 0
+        self.num_docs = 0
+        self.num_bytes = 0
+        self.num_indexed = 0
+        self.num_existing = 0
+        self.num_retried = 0
+        self.num_failed = 0
+        self.latencies = []
+        self.elapsed = 0.0
+
+    def observe(self, bulk_request, bulk_result, latency):
+        self.num_requests += 1
+        self.num_docs += bulk_request.num_docs
+        self.num_bytes += bulk_request.num_bytes
+        self.num_indexed += bulk_result.num_indexed
+        self.num_existing += bulk_result.num_existing
+        self.num_retried += bulk_result.num_retried
+        self.num_failed += bulk_result.num_failed
+        self.latencies.append(latency)
+
+    @property
+    def docs_per_second(self):
+        return self.num_docs / self.elapsed if self.elapsed else 0.0
+
+
+class BulkIndexer:
+    """Posts a stream of BulkRequests with up to `concurrency` requests in flight.
+
+    Requests are pulled from the stream on the calling thread, so decoding and transforming the next batch
+    overlaps with indexing the previous ones. Once `concurrency` requests are in flight the oldest one is waited
+    on before another is built, which bounds memory to concurrency + 1 request bodies.
+
+    Documents that could not be indexed are handed to `dead_letters`, if given.
+    """
+
+    DEFAULT_CONCURRENCY = 2
+
+    def __init__(self, es_client, concurrency=DEFAULT_CONCURRENCY, dead_letters=None):
+        self.es_client = es_client
+        self.concurrency = max(1, concurrency)
+        self.dead_letters = dead_letters
+
+    def index(self, bulk_requests):
+        """Posts every request in bulk_requests, raising the first error encountered.
+
+        Returns:
+            BulkIndexStats
+        """
+        stats = BulkIndexStats()
+        started = time.perf_counter()
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for bulk_request in bulk_requests:
+                if len(in_flight) >= self.concurrency:
+                    self._observe(stats, *in_flight.popleft().result())
+                in_flight.append(executor.submit(self._post, bulk_request))
+            while in_flight:
+                self._observe(stats, *in_flight.popleft().result())
+        stats.elapsed = time.perf_counter() - started
+        return stats
+
+    def _post(self, bulk_request):
+        started = time.perf_counter()
+        bulk_result = self.es_client.post_bulk_request(bulk_request)
+        return bulk_request, bulk_result, time.perf_counter() - started
+
+    def _observe(self, stats, bulk_request, bulk_result, latency):
+        stats.observe(bulk_request, bulk_result, latency)
+        if bulk_result.failures and self.dead_letters is not None:
+            self.dead_letters.add(bulk_result.failures)
+        logger.info("Posted bulk request of {} docs ({} bytes) in {:.3f}s, {:.0f} docs/sec, {} retried, {} failed".format(
+            bulk_request.num_docs,
+            bulk_request.num_bytes,
+            latency,
+            bulk_request.num_docs / latency if latency else 0.0,
+            bulk_result.num_retried,
+            bulk_result.num_failed
+        ))
@@ -0,0 +1,124 @@
+import hashlib
+from base64 import urlsafe_b64encode
+from collections import namedtuple
+
+from . import serializer
+
+BulkItemFailure = namedtuple('BulkItemFailure', ['status', 'error', 'source_line'])
+
+
+def event_id(doc):
+    """The CloudWatch Logs event id, which is unique per log event."""
+    return str(doc['@id'])
+
+
+def hashed_event_id(doc):
+    """A 22 character digest of the CloudWatch Logs event id, shorter to store than the 56 digit id."""
+    digest = hashlib.blake2b(str(doc['@id']).encode('utf-8'), digest_size=16).digest()
+    return urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
+
+
+DOCUMENT_IDS = {
+    'event_id': event_id,
+    'hash': hashed_event_id,
+}
+
+
+class BulkRequest:
+    """The NDJSON body of an Elasticsearch bulk request, assembled from lines that are serialized exactly once.
+
+    num_bytes is the exact size of the body, so requests can be cut to fit the domain's HTTP payload limit.
+    """
+
+    # AWS Elasticsearch rejects payloads over 10MiB on the smaller instance types
+    MAX_BYTES = 10000000
+    MAX_DOCS = 10000
+
+    INDEX_ACTION = b'{"index":{}}\n'
+
+    def __init__(self):
+        self.lines = []
+        self.num_bytes = 0
+        self.num_docs = 0
+        self.indices = set()
+
+    def __len__(self):
+        return self.num_docs
+
+    @property
+    def body(self):
+        return b''.join(self.lines)
+
+    def items(self):
+        """(action_line, source_line) pairs, in the order Elasticsearch reports their results."""
+        return zip(self.lines[0::2], self.lines[1::2])
+
+    def add(self, action_line, source_line, index=None):
+        if index is not None:
+            self.indices.add(index)
+        self.lines.append(action_line)
+        self.lines.append(source_line)
+        self.num_bytes += len(action_line) + len(source_line)
+        self.num_docs += 1
+
+    @classmethod
+    def from_docs(cls, docs, max_bytes=MAX_BYTES, max_docs=MAX_DOCS, document_id=None, op_type='index',
+                  index_prefix=None):
+        """Yields BulkRequests indexing docs, each at most max_bytes and max_docs unless a single document is
+        larger than max_bytes on its own.
+
+        Args:
+            document_id (str): a key of DOCUMENT_IDS to derive each document's _id from its event id, so re-indexing
+                the same file is idempotent, or None to let Elasticsearch assign ids
+            op_type (str): 'index' to overwrite documents with the same _id, 'create' to keep the existing ones
+            index_prefix (str): route each document to the daily index index_prefix-YYYY-MM-DD of its @timestamp,
+                or None to leave the index to the request URL
+        """
+        return cls.from_lines(cls.to_lines(docs, document_id, op_type, index_prefix), max_bytes, max_docs)
+
+    @classmethod
+    def to_lines(cls, docs, document_id=None, op_type='index', index_prefix=None):
+        """Yields the (action_line, source_line, index) of each of docs, see from_docs for the arguments."""
+        get_id = DOCUMENT_IDS[document_id] if document_id else None
+        action_lines = {}
+        for doc in docs:
+            index = f"{index_prefix}-{doc['@timestamp'][:10]}" if index_prefix else None
+            if get_id is not None:
+                action = {'_id': get_id(doc)}
+                if index:
+                    action['_index'] = index
+                action_line = serializer.dumps_bytes({op_type: action}) + b'\n'
+            elif index:
+                action_line = action_lines.get(index)
+                if action_line is None:
+                    action_line = action_lines[index] = serializer.dumps_bytes({op_type: {'_index': index}}) + b'\n'
+            else:
+                action_line = cls.INDEX_ACTION
+            yield action_line, serializer.dumps_bytes(doc) + b'\n', index
+
+    @classmethod
+    def from_lines(cls, lines, max_bytes=MAX_BYTES, max_docs=MAX_DOCS):
+        """Yields BulkRequests of the (action_line, source_line, index) lines, cut as in from_docs."""
+        request = cls()
+        for action_line, source_line, index in lines:
+            size = len(action_line) + len(source_line)
+            if request.num_docs and (request.num_bytes + size > max_bytes or request.num_docs >= max_docs):
+                yield request
+                request = cls()
+            request.add(action_line, source_line, index)
+        if request.num_docs:
+            yield request
+
+
+class BulkResult:
+    """The outcome of posting a BulkRequest, after retrying rejected documents."""
+
+    def __init__(self):
+        self.num_indexed = 0
+        self.num_existing = 0
+        self.num_retried = 0
+        self.failures = []
+
+    @property
+    def num_failed(self):
+        return len(self.failures)
@@ -1,59 +1,150 @@
 import boto3
-from itertools import groupby
-from operator import itemgetter
+import json
+import logging
+import sys
+import threading
+import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
-cloudwatch = boto3.client('cloudwatch')
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
+NAMESPACE = 'Logs'
 
-def observe_counts(report):
-    per_log_group_per_type_counts_metric_data = [
-        {
-            'MetricName': 'By Log Group, by Type',
-            'Dimensions': [
-                {
-                    'Name': 'LogGroup',
-                    'Value': log_group
-                },
-                {
-                    'Name': 'CountType',
-                    'Value': count_type
+
+@lru_cache(maxsize=None)
+def get_cloudwatch():
+    return boto3.client('cloudwatch')
+
+
+class MetricsBuffer:
+    """Collects metric observations over an invocation and publishes them all at once when flushed.
+
+    Observations of the same metric and dimensions are merged, so the number of datums stays at the number of
+    distinct dimension sets.
+
+    With the 'api' publisher each is sent as a StatisticValues datum, which keeps the sample count, sum, minimum
+    and maximum, in PutMetricData requests of up to 1000, several at a time. The boto3 this app is pinned to does
+    not support the Values and Counts arrays. With the 'emf' publisher the observations are written to stdout in
+    CloudWatch Embedded Metric Format instead, which CloudWatch Logs turns into metrics asynchronously, so the
+    invocation does not wait on the CloudWatch API at all and every observation is kept.
+    """
+
+    PUBLISHERS = ('api', 'emf')
+    MAX_DATUMS = 1000
+    MAX_EMF_VALUES = 100
+    CONCURRENCY = 4
+
+    def __init__(self, namespace=NAMESPACE, publisher='api', storage_resolution=60, stream=None):
+        if publisher not in self.PUBLISHERS:
+            raise ValueError(f"Unknown metrics publisher {publisher}, expected one of {self.PUBLISHERS}")
+        self.namespace = namespace
+        self.publisher = publisher
+        self.storage_resolution = storage_resolution
+        self.stream = stream
+        self._metrics = dict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._metrics)
+
+    def add(self, metric_name, dimensions, value, unit='Count'):
+        """Records one observation of the metric, dimensions being a sequence of (name, value) pairs."""
+        key = (metric_name, tuple(dimensions), unit)
+        with self._lock:
+            values = self._metrics.get(key)
+            if values is None:
+                values = self._metrics[key] = defaultdict(int)
+            values[value] += 1
+
+    def flush(self):
+        with self._lock:
+            metrics, self._metrics = self._metrics, dict()
+        if not metrics:
+            return
+        try:
+            if self.publisher == 'emf':
+                stream = self.stream or sys.stdout
+                for line in self.emf_lines(metrics):
+                    stream.write(line + '\n')
+                stream.flush()
+            else:
+                self._put_metric_data(self.metric_data(metrics))
+        except Exception:
+            logger.exception("Failed to publish {} metrics".format(len(metrics)))
+
+    def metric_data(self, metrics):
+        """The PutMetricData datums of the metrics, one with the statistics of its observations per dimension set."""
+        metric_data = []
+        for (metric_name, dimensions, unit), values in metrics.items():
+            metric_data.append({
+                'MetricName': metric_name,
+                'Dimensions': [{'Name': name, 'Value': value} for name, value in dimensions],
+                'StatisticValues': {
+                    'SampleCount': sum(values.values()),
+                    'Sum': sum(value * count for value, count in values.items()),
+                    'Minimum': min(values),
+                    'Maximum': max(values)
                 },
-            ],
-            'Value': count,
-            'Unit': 'Count',
-            'StorageResolution': 60
-        } for (log_group, count_type, count) in report
-    ]
-    for metric_data_chunk in _chunks(per_log_group_per_type_counts_metric_data, 20):
-        cloudwatch.put_metric_data(
+                'Unit': unit,
+                'StorageResolution': self.storage_resolution
+            })
+        return metric_data
+
+    def emf_lines(self, metrics, timestamp=None):
+        """Embedded Metric Format log lines of the metrics, one or more per dimension set."""
+        timestamp = int(time.time() * 1000) if timestamp is None else timestamp
+        by_dimensions = defaultdict(dict)
+        for (metric_name, dimensions, unit), values in metrics.items():
+            observations = [value for value, count in sorted(values.items()) for _ in range(count)]
+            by_dimensions[dimensions][metric_name] = (unit, observations)
+        for dimensions, metric_values in by_dimensions.items():
+            while metric_values:
+                line = {
+                    '_aws': {
+                        'Timestamp': timestamp,
+                        'CloudWatchMetrics': [{
+                            'Namespace': self.namespace,
+                            'Dimensions': [[name for name, _ in dimensions]],
+                            'Metrics': [{'Name': name, 'Unit': unit} for name, (unit, _) in metric_values.items()]
+                        }]
+                    },
+                    **dict(dimensions)
+                }
+                remaining = dict()
+                for metric_name, (unit, observations) in metric_values.items():
+                    line[metric_name] = observations[:self.MAX_EMF_VALUES]
+                    if len(observations) > self.MAX_EMF_VALUES:
+                        remaining[metric_name] = (unit, observations[self.MAX_EMF_VALUES:])
+                metric_values = remaining
+                yield json.dumps(line)
+
+    def _put_metric_data(self, metric_data):
+        chunks = list(_chunks(metric_data, self.MAX_DATUMS))
+        if len(chunks) == 1:
+            self._put_metric_data_chunk(chunks[0])
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.CONCURRENCY, len(chunks))) as executor:
+                list(executor.map(self._put_metric_data_chunk, chunks))
+
+    def _put_metric_data_chunk(self, metric_data_chunk):
+        get_cloudwatch().put_metric_data(
             MetricData=metric_data_chunk,
-            Namespace='Logs',
+            Namespace=self.namespace,
         )
 
+
+def observe_counts(report, metrics):
+    """Adds the counts of an AirbrakeNotifier report to metrics, by log group and type and in total by type."""
     per_type_counts = defaultdict(int)
     for (log_group, count_type, count) in report:
+        metrics.add('By Log Group, by Type', [('LogGroup', log_group), ('CountType', count_type)], count)
         per_type_counts[count_type] += count
 
-    per_type_metric_data = [
-        {
-            'MetricName': 'By Type',
-            'Dimensions': [
-                {
-                    'Name': 'CountType',
-                    'Value': count_type
-                }
-            ],
-            'Value': count,
-            'Unit': 'Count',
-            'StorageResolution': 60
-        } for (count_type, count) in per_type_counts.items()
-    ]
-    for metric_data_chunk in _chunks(per_type_metric_data, 20):
-        cloudwatch.put_metric_data(
-            MetricData=metric_data_chunk,
-            Namespace='Logs',
-        )
+    for (count_type, count) in per_type_counts.items():
+        metrics.add('By Type', [('CountType', count_type)], count)
 
 
 def _chunks(l, n):
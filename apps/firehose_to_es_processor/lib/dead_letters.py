@@ -0,0 +1,55 @@
+import logging
+
+from . import serializer
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class DeadLetters:
+    """Documents Elasticsearch would not index, kept as NDJSON so they can be inspected and replayed.
+
+    Each line holds the document under "source" along with the status and error Elasticsearch returned. The lines
+    of each processed file are stored by `write(s3_object_key, body)`; `to_s3` and `to_file` make the ones that
+    write an object per file under a prefix of the Firehose bucket, and append to a local file.
+    """
+
+    def __init__(self, write):
+        self.write = write
+        self.failures = []
+
+    @classmethod
+    def to_s3(cls, s3_client, prefix):
+        def write(s3_object_key, body):
+            s3_client.put_file(f"{prefix}{s3_object_key}.ndjson", body)
+        return cls(write)
+
+    @classmethod
+    def to_file(cls, path):
+        def write(s3_object_key, body):
+            with open(path, 'ab') as fh:
+                fh.write(body)
+        return cls(write)
+
+    def __len__(self):
+        return len(self.failures)
+
+    def add(self, failures):
+        self.failures.extend(failures)
+
+    def flush(self, s3_object_key):
+        """Writes the failures collected while processing s3_object_key and clears them."""
+        if self.failures:
+            self.write(s3_object_key, self._to_ndjson(s3_object_key))
+            logger.info("Dead-lettered {} documents from {}".format(len(self.failures), s3_object_key))
+            self.failures = []
+
+    def _to_ndjson(self, s3_object_key):
+        return b''.join(
+            serializer.dumps_bytes({
+                's3_object_key': s3_object_key,
+                'status': failure.status,
+                'error': failure.error,
+                'source': serializer.loads(failure.source_line)
+            }) + b'\n' for failure in self.failures
+        )
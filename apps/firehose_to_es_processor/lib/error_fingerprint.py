@@ -0,0 +1,78 @@
+import hashlib
+import re
+from collections import OrderedDict, defaultdict
+from itertools import zip_longest
+
+# in order, so the digits of UUIDs and timestamps are not normalized as numbers first
+_VARIABLE_PARTS = [
+    (re.compile(r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}'), '<uuid>'),
+    (re.compile(r'\d{4}-\d\d-\d\d[T ]\d\d:\d\d:\d\d(?:[.,]\d+)?(?:Z|[+-]\d\d:?\d\d)?'), '<timestamp>'),
+    (re.compile(r'\b(?=[0-9a-fA-F]*\d)[0-9a-fA-F]{8,}\b'), '<hex>'),
+    (re.compile(r'(?<![A-Za-z])\d+(?:\.\d+)?'), '<n>'),
+]
+
+
+def normalize(message):
+    """The message with the UUIDs, timestamps, hex ids and numbers that differ between repeats of an error
+    replaced by placeholders."""
+    for pattern, placeholder in _VARIABLE_PARTS:
+        message = pattern.sub(placeholder, message)
+    return message
+
+
+def fingerprint(log_group, message):
+    """Identifies repeats of the same error in a log group."""
+    return log_group, hashlib.blake2b(normalize(message).encode('utf-8'), digest_size=8).hexdigest()
+
+
+class ErrorCounts:
+    """Occurrences of each error fingerprint, with the first log event seen for it.
+
+    Only the `max_fingerprints` most recently seen fingerprints are kept, so a stream of distinct errors cannot
+    grow it without bound; `num_evicted` counts the ones dropped.
+    """
+
+    MAX_FINGERPRINTS = 1000
+
+    def __init__(self, max_fingerprints=MAX_FINGERPRINTS):
+        self.max_fingerprints = max_fingerprints
+        self.num_evicted = 0
+        self._errors = OrderedDict()
+
+    def __len__(self):
+        return len(self._errors)
+
+    def items(self):
+        """(fingerprint, [count, log_group, message, log_stream]) of each error, least recently seen first."""
+        return self._errors.items()
+
+    def add(self, log_group, message, log_stream, count=1):
+        key = fingerprint(log_group, message)
+        error = self._errors.get(key)
+        if error is None:
+            self._errors[key] = [count, log_group, message, log_stream]
+            if len(self._errors) > self.max_fingerprints:
+                self._errors.popitem(last=False)
+                self.num_evicted += 1
+        else:
+            error[0] += count
+            self._errors.move_to_end(key)
+
+    def merge(self, other):
+        for _, (count, log_group, message, log_stream) in other.items():
+            self.add(log_group, message, log_stream, count)
+        self.num_evicted += other.num_evicted
+
+    def most_common(self, n):
+        """Up to n errors, taking the most frequent of each log group in turn so that no group crowds out the
+        others, as (fingerprint, count, log_group, message, log_stream)."""
+        by_log_group = defaultdict(list)
+        for key, (count, log_group, message, log_stream) in self._errors.items():
+            by_log_group[log_group].append((key, count, log_group, message, log_stream))
+        for errors in by_log_group.values():
+            errors.sort(key=lambda error: error[1], reverse=True)
+        ranked = sorted(by_log_group.values(), key=lambda errors: errors[0][1], reverse=True)
+        selected = []
+        for errors in zip_longest(*ranked):
+            selected.extend(error for error in errors if error is not None)
+        return selected[:n]
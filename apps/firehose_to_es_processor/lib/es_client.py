@@ -1,91 +1,253 @@
-import boto3
 import datetime
-from botocore.credentials import create_credential_resolver
-from botocore.session import get_session
-from elasticsearch import Elasticsearch, RequestsHttpConnection, helpers
-from requests_aws4auth import AWS4Auth
+import time
+from elasticsearch import Elasticsearch, RequestsHttpConnection
+from elasticsearch.compat import string_types
+from elasticsearch.exceptions import ConnectionError, RequestError, SerializationError, TransportError
+from elasticsearch.serializer import JSONSerializer
 from retrying import retry
+from . import aws_es, serializer
+from .bulk_request import BulkItemFailure, BulkRequest, BulkResult
 from .secrets import config
 
 
-class ESClient:
+def _is_transient(exception):
+    """Whether a bulk request that failed with exception may succeed if sent again: connection errors, timeouts,
+    429 and 5xx responses."""
+    if isinstance(exception, ConnectionError):
+        return True
+    status_code = getattr(exception, 'status_code', None)
+    return isinstance(exception, TransportError) and isinstance(status_code, int) and \
+        (status_code == 429 or status_code >= 500)
 
-    es_endpoint = boto3.client('es')\
-        .describe_elasticsearch_domain(DomainName=config['es_domain_name'])['DomainStatus']['Endpoint']
 
-    def __init__(self):
-        credential_resolver = create_credential_resolver(get_session())
-        credentials = credential_resolver.load_credentials()
-        awsauth = AWS4Auth(
-            credentials.access_key,
-            credentials.secret_key,
-            'us-east-1',
-            'es',
-            session_token=credentials.token)
-        self.es = Elasticsearch(
-            hosts=[{'host': self.es_endpoint, 'port': 443}],
-            http_auth=awsauth,
-            use_ssl=True,
-            verify_certs=True,
-            connection_class=RequestsHttpConnection)
+def _is_payload_rejected(exception):
+    """Whether a bulk request failed because of its body, which sending it again would not change: 400 for a
+    malformed body and 413 for one over the cluster's size limit. Other statuses, such as 401/403 from a bad
+    signature or IAM policy and 404 from a wrong endpoint, say nothing about the documents."""
+    return isinstance(exception, TransportError) and exception.status_code in (400, 413)
 
-    @retry(wait_fixed=1000, stop_max_attempt_number=3)
-    def create_cwl_day_index(self, prefix="cwl"):
-        """ES CREATE specific index
 
-        Args:
-            index_name (str): Index name
+class ESSerializer(JSONSerializer):
+    """Request and response (de)serialization through lib.serializer, so bulk bodies are encoded by orjson
+    when it is available."""
 
-        Returns:
-            dict: ES answer
-        """
-        request_body = {
-            "settings": {
-                "number_of_shards": 3,
-                "number_of_replicas": 0,
-                "analysis": {
-                    "analyzer": {
-                        "default": {
-                            "tokenizer": "bundle_id_tokenizer",
-                        }
-                    },
-                    "tokenizer": {
-                        "bundle_id_tokenizer": {
-                            "type": "pattern",
-                            "pattern": "[\s,{}\[\]\";'+=%^$!~`|\\/?&]+|[.](?![0-9]{6,6}Z)"
-                        }
+    def loads(self, s):
+        try:
+            return serializer.loads(s)
+        except (ValueError, TypeError) as e:
+            raise SerializationError(s, e)
+
+    def dumps(self, data):
+        # don't serialize strings
+        if isinstance(data, string_types):
+            return data
+
+        try:
+            return serializer.dumps(data, default=self.default)
+        except (ValueError, TypeError) as e:
+            raise SerializationError(data, e)
+
+
+class ESClient:
+
+    MAX_ITEM_RETRIES = 5
+    INITIAL_BACKOFF = 0.5
+    MAX_BACKOFF = 8
+
+    # seconds an index that exists is remembered across warm invocations before it is checked again
+    INDEX_CACHE_TTL = 3600
+
+    index_body = {
+        "settings": {
+            "number_of_shards": 3,
+            "number_of_replicas": 0,
+            "analysis": {
+                "analyzer": {
+                    "default": {
+                        "tokenizer": "bundle_id_tokenizer",
+                    }
+                },
+                "tokenizer": {
+                    "bundle_id_tokenizer": {
+                        "type": "pattern",
+                        "pattern": "[\s,{}\[\]\";'+=%^$!~`|\\/?&]+|[.](?![0-9]{6,6}Z)"
                     }
                 }
-            },
-            "mappings": {
-                "fromFirehose": {
-                    "properties": {
-                        "@log_group": {
-                            "type": "text",
-                            "fields": {
-                                "keyword": {
-                                    "type": "keyword"
-                                }
+            }
+        },
+        "mappings": {
+            "fromFirehose": {
+                "properties": {
+                    "@log_group": {
+                        "type": "text",
+                        "fields": {
+                            "keyword": {
+                                "type": "keyword"
                             }
                         }
                     }
                 }
             }
         }
-        index_name = self._format_today_index_name(prefix)
+    }
+
+    es_endpoint = aws_es.get_endpoint(config['es_domain_name'])
+    _es = None
+    _known_indices = {}  # index name -> time.monotonic() at which to check it again
+    _templates = set()
+
+    def __init__(self):
+        self.es = ESClient.get_elasticsearch()
+
+    @classmethod
+    def get_elasticsearch(cls):
+        """The Elasticsearch client, built once per container so its pooled connections survive warm starts."""
+        if cls._es is None:
+            cls._es = Elasticsearch(
+                hosts=[{'host': cls.es_endpoint, 'port': 443}],
+                http_auth=aws_es.get_auth(aws_es.get_region(cls.es_endpoint)),
+                use_ssl=True,
+                verify_certs=True,
+                connection_class=RequestsHttpConnection,
+                serializer=ESSerializer())
+        return cls._es
+
+    def create_cwl_day_index(self, prefix="cwl"):
+        """ES CREATE today's index, unless it is already known to exist
+
+        Args:
+            prefix (str): Index name prefix
+        """
+        self.create_index(self._format_today_index_name(prefix))
+
+    @retry(wait_fixed=1000, stop_max_attempt_number=3)
+    def create_index(self, index_name):
+        """ES CREATE specific index with the cwl settings and mappings, unless it is already known to exist
+
+        Args:
+            index_name (str): Index name
+        """
+        if self._is_known_index(index_name):
+            return
         if not self.es.indices.exists(index_name):
-            self.es.indices.create(index=index_name, body=request_body)
+            try:
+                self.es.indices.create(index=index_name, body=self.index_body)
+            except RequestError as e:
+                # created by a concurrent invocation, or implicitly by a bulk request
+                if e.error not in ('index_already_exists_exception', 'resource_already_exists_exception'):
+                    raise
+        self._remember_index(index_name)
+
+    @retry(wait_fixed=1000, stop_max_attempt_number=3)
+    def put_index_template(self, prefix="cwl"):
+        """ES PUT a template applying the cwl settings and mappings to every index named prefix-*, so indices
+        that bulk requests create implicitly are configured like those made by create_index. Only sent once per
+        container.
+        """
+        if prefix in ESClient._templates:
+            return
+        self.es.indices.put_template(name=prefix, body={"template": f"{prefix}-*", **self.index_body})
+        ESClient._templates.add(prefix)
+
+    @classmethod
+    def _is_known_index(cls, index_name):
+        expires = cls._known_indices.get(index_name)
+        return expires is not None and expires > time.monotonic()
+
+    @classmethod
+    def _remember_index(cls, index_name):
+        cls._known_indices[index_name] = time.monotonic() + cls.INDEX_CACHE_TTL
+
+    @classmethod
+    def _forget_index(cls, index_name):
+        cls._known_indices.pop(index_name, None)
 
     @retry(wait_fixed=1000, stop_max_attempt_number=3)
     def delete_index(self, index_name):
+        self._forget_index(index_name)
         self.es.indices.delete(index=index_name)
 
-    @retry(wait_fixed=1000, stop_max_attempt_number=3)
     def bulk_post(self, payload, prefix="cwl"):
+        return [
+            self.post_bulk_request(bulk_request, prefix)
+            for bulk_request in BulkRequest.from_docs(payload, index_prefix=prefix)
+        ]
+
+    def post_bulk_request(self, bulk_request, prefix="cwl"):
+        """POST a prebuilt BulkRequest body as is, then resend only the documents Elasticsearch rejected as
+        overloaded, with exponential backoff.
+
+        Documents that fail permanently, or are still rejected after MAX_ITEM_RETRIES, are returned as failures
+        rather than raised, so one bad document does not fail the whole request. So are all of the documents of a
+        request Elasticsearch refuses as a whole with 400 or 413, which sending it again would not change.
+        Transient errors are retried a few times and then raised, as is any other error, so that the file stays
+        in the bucket for the next attempt.
+
+        Documents without a routed index go to today's. Indices are not created up front: the template from
+        put_index_template configures those the bulk request creates, and an index still reported missing is
+        created before its documents are resent.
+
+        Returns:
+            BulkResult
+        """
         index_name = self._format_today_index_name(prefix)
-        helpers.bulk(self.es, payload, index=index_name, doc_type='fromFirehose')
+        result = BulkResult()
+        pending = bulk_request
+        for attempt in range(self.MAX_ITEM_RETRIES + 1):
+            try:
+                response = self._post_bulk_body(index_name, pending.body)
+            except TransportError as e:
+                if not _is_payload_rejected(e):
+                    raise
+                result.failures.extend(
+                    BulkItemFailure(e.status_code, e.error, source_line) for _, source_line in pending.items())
+                break
+            retryable = BulkRequest()
+            missing_indices = set()
+            for (action_line, source_line), item in zip(pending.items(), response['items']):
+                op_type, status, error = self._item_status(item)
+                if 200 <= status < 300:
+                    result.num_indexed += 1
+                elif status == 409 and op_type == 'create':
+                    # indexed by an earlier attempt at this file
+                    result.num_existing += 1
+                elif self._is_missing_index(error) and attempt < self.MAX_ITEM_RETRIES:
+                    missing_indices.add(next(iter(item.values())).get('_index', index_name))
+                    retryable.add(action_line, source_line)
+                elif self._is_retryable(status, error) and attempt < self.MAX_ITEM_RETRIES:
+                    retryable.add(action_line, source_line)
+                else:
+                    result.failures.append(BulkItemFailure(status, error, source_line))
+            if not retryable.num_docs:
+                break
+            result.num_retried += retryable.num_docs
+            for missing_index in missing_indices:
+                self._forget_index(missing_index)
+                self.create_index(missing_index)
+            if len(missing_indices) == 0:
+                time.sleep(min(self.INITIAL_BACKOFF * 2 ** attempt, self.MAX_BACKOFF))
+            pending = retryable
+        return result
+
+    @retry(wait_fixed=1000, stop_max_attempt_number=3, retry_on_exception=_is_transient)
+    def _post_bulk_body(self, index_name, body):
+        return self.es.transport.perform_request('POST', f"/{index_name}/fromFirehose/_bulk", body=body)
+
+    @staticmethod
+    def _item_status(item):
+        op_type, info = next(iter(item.items()))
+        return op_type, info.get('status', 500), info.get('error')
+
+    @staticmethod
+    def _is_missing_index(error):
+        return isinstance(error, dict) and error.get('type') == 'index_not_found_exception'
+
+    @staticmethod
+    def _is_retryable(status, error):
+        error_type = error.get('type') if isinstance(error, dict) else error
+        return status == 429 or error_type == 'es_rejected_execution_exception'
 
     def _format_today_index_name(self, prefix):
         index_format = "%Y-%m-%d"
-        today_index_name = prefix + "-" + datetime.datetime.today().strftime(index_format)
+        today_index_name = prefix + "-" + datetime.datetime.utcnow().strftime(index_format)
         return today_index_name
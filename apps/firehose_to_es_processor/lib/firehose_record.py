@@ -1,6 +1,7 @@
-import json
 import re
-from datetime import datetime
+from datetime import datetime, timezone
+from functools import lru_cache
+from lib.serializer import dumps_compatible
 from lib.util import extract_json
 
 
@@ -11,11 +12,23 @@ class FirehoseRecord:
     def __init__(self, record):
         self.record = record
         self.message_type = record['messageType']
+        self._envelope = None
 
     def transform_and_extract_from_log_events_in_record(self):
         for event in self.record['logEvents']:
             yield self._transform_and_extract_from_log_event(event)
 
+    @property
+    def envelope(self):
+        """The fields shared by every log event in the record."""
+        if self._envelope is None:
+            self._envelope = {
+                "@owner": self.record["owner"],
+                "@log_group": self.record["logGroup"],
+                "@log_stream": self.record["logStream"]
+            }
+        return self._envelope
+
     def _transform_and_extract_from_log_event(self, log_event):
         """Transform each log event.
 
@@ -25,15 +38,11 @@ class FirehoseRecord:
         Returns:
         dict: transformed payload
         """
-        timestamp_in_seconds = log_event["timestamp"] / 1000.0
-        transformed_timestamp = datetime.fromtimestamp(timestamp_in_seconds).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
         transformed_payload = {
             "@message": log_event["message"],
             "@id": log_event["id"],
-            "@timestamp": transformed_timestamp,
-            "@owner": self.record["owner"],
-            "@log_group": self.record["logGroup"],
-            "@log_stream": self.record["logStream"]
+            "@timestamp": format_timestamp(log_event["timestamp"]),
+            **self.envelope
         }
 
         transformed_message = extract_json(log_event["message"])
@@ -44,6 +53,18 @@ class FirehoseRecord:
                 del transformed_message['index']
             for k, v in transformed_message.items():
                 if FirehoseRecord.invalid_chars.search(k) is None:
-                    transformed_payload[k] = json.dumps(v)
+                    transformed_payload[k] = dumps_compatible(v)
 
         return transformed_payload
+
+
+def format_timestamp(timestamp_in_ms):
+    """Formats epoch milliseconds as a UTC ISO 8601 timestamp with millisecond resolution, e.g.
+    2018-03-02T05:58:17.016Z"""
+    seconds, milliseconds = divmod(int(timestamp_in_ms), 1000)
+    return f"{_format_second(seconds)}.{milliseconds:03d}Z"
+
+
+@lru_cache(maxsize=4096)
+def _format_second(seconds):
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
@@ -1,30 +1,142 @@
 import json
+import re
+
+from . import serializer
+
+_TOKENS = {
+    str: (re.compile(r'\\.|["{}]', re.DOTALL), '"', '{'),
+    bytes: (re.compile(rb'\\.|["{}]', re.DOTALL), b'"', b'{'),
+}
+
+
+def _object_end(buffer, start):
+    """Returns the index just past the closing brace of the object beginning at start, or None."""
+    tokens, quote, open_brace = _TOKENS[type(buffer)]
+    brackets = 0
+    quotes_active = False
+    for match in tokens.finditer(buffer, start):
+        token = match.group()
+        if token == quote:
+            quotes_active = not quotes_active
+        elif quotes_active or len(token) == 2:
+            continue
+        elif token == open_brace:
+            brackets += 1
+        else:
+            brackets -= 1
+            if brackets == 0:
+                return match.end()
+    return None
 
 
 class JsonObjectStream:
+    """Iterates over the JSON objects in a reader of concatenated objects, e.g. '{"a": 1}{"b": 2}'.
+
+    The reader is consumed in blocks of `chunk_size` characters. Objects are decoded straight out of the
+    buffer with `json.JSONDecoder.raw_decode`; the token-level brace scan is only used when decoding fails,
+    to tell an object that straddles the end of the buffer apart from a complete but invalid one.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
 
-    def __init__(self, reader):
+    _decoder = json.JSONDecoder()
+    _whitespace = re.compile(r'\s*')
+
+    def __init__(self, reader, chunk_size=CHUNK_SIZE):
         self.reader = reader
+        self.chunk_size = chunk_size
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            self._pos = self._whitespace.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                try:
+                    obj, self._pos = self._decoder.raw_decode(self._buffer, self._pos)
+                    return obj
+                except json.JSONDecodeError:
+                    end = _object_end(self._buffer, self._pos)
+                    if end is not None:
+                        # the object is complete, so it is invalid rather than truncated
+                        start, self._pos = self._pos, end
+                        return json.loads(self._buffer[start:end])
+            if self._eof or not self._fill():
+                raise StopIteration()
+
+    def _fill(self):
+        chunk = self.reader.read(self.chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+
+class JsonBytesObjectStream:
+    """Iterates over the JSON objects in an iterable of UTF-8 encoded chunks, e.g. [b'{"a": 1}{"b"', b': 2}'].
+
+    Boundaries are located on the raw bytes by searching for the '}{' seam Firehose leaves between records,
+    and only the bytes of each complete object are handed to `serializer.loads`. A seam that turns out to be inside
+    a string falls back to the token-level brace scan.
+    """
+
+    _whitespace = re.compile(rb'\s*')
+    _seam = re.compile(rb'}\s*{')
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self._buffer = b''
+        self._pos = 0
+        self._search_from = 0
+        self._eof = False
 
     def __iter__(self):
         return self
 
     def __next__(self):
-        brackets = 0
-        slash_active = False
-        quotes_active = False
-        result = []
         while True:
-            c = self.reader.read(1)
-            if c == '':
+            self._pos = self._whitespace.match(self._buffer, self._pos).end()
+            self._search_from = max(self._search_from, self._pos)
+            seam = self._seam.search(self._buffer, self._search_from)
+            if seam is not None:
+                obj = self._decode(seam.start() + 1)
+                if obj is not None:
+                    return obj
+            elif self._eof and self._pos < len(self._buffer):
+                obj = self._decode(len(self._buffer))
+                if obj is not None:
+                    return obj
+            if self._eof:
                 raise StopIteration()
-            result += [c]
-            if c == '"':
-                quotes_active = quotes_active if slash_active else (not quotes_active)
-            if c == '{':
-                brackets += 0 if quotes_active else 1
-            if c == '}':
-                brackets += 0 if quotes_active else -1
-                if brackets == 0:
-                    return json.loads(''.join(result))
-            slash_active = (not slash_active) if c == "\\" else False
+            self._fill()
+
+    def _decode(self, end):
+        start = self._pos
+        try:
+            obj = serializer.loads(self._buffer[start:end])
+            self._pos = self._search_from = end
+            return obj
+        except ValueError:
+            pass
+        end = _object_end(self._buffer, start)
+        if end is None:
+            # the object continues past the end of the buffer
+            self._search_from = len(self._buffer)
+            return None
+        self._pos = self._search_from = end
+        return serializer.loads(self._buffer[start:end])
+
+    def _fill(self):
+        for chunk in self.chunks:
+            if chunk:
+                self._search_from = max(self._search_from - self._pos - 1, 0)
+                self._buffer = self._buffer[self._pos:] + chunk
+                self._pos = 0
+                return
+        self._eof = True
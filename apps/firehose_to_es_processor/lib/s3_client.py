@@ -1,31 +1,81 @@
 import boto3
 import gzip
 import io
+import zlib
 from retrying import retry
-from .json_object_stream import JsonObjectStream
+from .json_object_stream import JsonObjectStream, JsonBytesObjectStream
+from .s3_prefetch_reader import S3PrefetchReader
 
 
 class S3Client:
+
+    READ_SIZE = 1024 * 1024
+    DECOMPRESSED_CHUNK_SIZE = 8 * 1024 * 1024
+    GZIP_WBITS = 16 + zlib.MAX_WBITS
+
     def __init__(self, region, bucket):
         self.region = region
         self.bucket = bucket
         self.s3 = boto3.resource('s3')
+        # unlike resources, low-level clients are thread safe, so an S3Client can be shared between workers
+        self.client = self.s3.meta.client
 
     @retry(wait_fixed=1000, stop_max_attempt_number=3)
     def retrieve_file(self, s3_object_key):
-        obj = self.s3.Object(self.bucket, s3_object_key)
-        return obj.get()
+        return self.client.get_object(Bucket=self.bucket, Key=s3_object_key)
+
+    def open_file(self, s3_object_key, part_size=S3PrefetchReader.PART_SIZE, depth=S3PrefetchReader.DEPTH):
+        """Opens the object for reading as concurrent ranged GETs, up to depth parts of part_size bytes ahead."""
+        return S3PrefetchReader(self.client, self.bucket, s3_object_key, part_size, depth)
 
     @classmethod
     def unzip_and_parse_firehose_file(cls, file):
         with gzip.GzipFile(fileobj=file, mode='rb') as fh:
             fw = io.TextIOWrapper(fh, 'utf-8')
-            # Extract 10MB chunks from the compressed file
-            fw._CHUNK_SIZE = 10000000
-            for obj in JsonObjectStream(fw):
+            for obj in JsonObjectStream(fw, chunk_size=cls.DECOMPRESSED_CHUNK_SIZE):
                 yield obj
 
+    @classmethod
+    def stream_firehose_file(cls, file, read_size=READ_SIZE, chunk_size=DECOMPRESSED_CHUNK_SIZE):
+        """Parses a gzipped Firehose file without decoding it to text first.
+
+        The body is read and inflated incrementally, so memory use is bounded by `read_size` and `chunk_size`
+        rather than by the size of the object.
+        """
+        return JsonBytesObjectStream(cls.gunzip_chunks(file, read_size, chunk_size))
+
+    @classmethod
+    def gunzip_chunks(cls, file, read_size=READ_SIZE, chunk_size=DECOMPRESSED_CHUNK_SIZE):
+        """Yields the decompressed contents of a gzip stream, possibly of several members, in chunks of at most
+        chunk_size bytes."""
+        decompressor = zlib.decompressobj(cls.GZIP_WBITS)
+        pending = False
+        while True:
+            compressed = file.read(read_size)
+            if not compressed:
+                break
+            while compressed:
+                pending = True
+                chunk = decompressor.decompress(compressed, chunk_size)
+                if chunk:
+                    yield chunk
+                if decompressor.eof:
+                    # a file may hold several concatenated gzip members
+                    compressed = decompressor.unused_data
+                    decompressor = zlib.decompressobj(cls.GZIP_WBITS)
+                    pending = False
+                else:
+                    compressed = decompressor.unconsumed_tail
+        chunk = decompressor.flush()
+        if chunk:
+            yield chunk
+        if pending and not decompressor.eof:
+            raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+
+    @retry(wait_fixed=1000, stop_max_attempt_number=3)
+    def put_file(self, s3_object_key, body):
+        self.client.put_object(Bucket=self.bucket, Key=s3_object_key, Body=body)
+
     @retry(wait_fixed=1000, stop_max_attempt_number=3)
     def delete_file(self, s3_object_key):
-        obj = self.s3.Object(self.bucket, s3_object_key)
-        obj.delete()
+        self.client.delete_object(Bucket=self.bucket, Key=s3_object_key)
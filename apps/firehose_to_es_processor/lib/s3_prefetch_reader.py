@@ -0,0 +1,128 @@
+import io
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+from retrying import retry
+
+
+def _is_transient(exception):
+    return not (isinstance(exception, ClientError) and
+                exception.response['Error']['Code'] in ('NoSuchKey', 'InvalidRange', 'PreconditionFailed'))
+
+
+class S3PrefetchReader(io.RawIOBase):
+    """A read-only file over an S3 object that downloads it as concurrent byte-range GETs ahead of the reader.
+
+    The first part is fetched when the file is first read, which also gives the object's size and ETag. After
+    that up to `depth` parts of `part_size` bytes are in flight or waiting to be read while the caller works
+    through the current one, so memory is bounded to depth + 1 parts. Later parts are requested with the ETag of
+    the first, so an object replaced halfway through the read fails instead of being spliced together.
+    """
+
+    PART_SIZE = 8 * 1024 * 1024
+    DEPTH = 4
+
+    _content_range = re.compile(r'bytes (\d+)-(\d+)/(\d+)')
+
+    def __init__(self, client, bucket, key, part_size=PART_SIZE, depth=DEPTH):
+        super().__init__()
+        if part_size < 1 or depth < 1:
+            raise ValueError("part_size and depth must be positive")
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.depth = depth
+        self.size = None
+        self.etag = None
+        self._executor = ThreadPoolExecutor(max_workers=depth)
+        self._pending = deque()
+        self._next_offset = 0
+        self._part = b''
+        self._part_pos = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return self.readall()
+        if self._part_pos >= len(self._part) and not self._next_part():
+            return b''
+        chunk = self._part[self._part_pos:self._part_pos + size]
+        self._part_pos += len(chunk)
+        return chunk
+
+    def readinto(self, b):
+        chunk = self.read(len(b))
+        b[:len(chunk)] = chunk
+        return len(chunk)
+
+    def readall(self):
+        chunks = []
+        chunk = self.read(self.part_size)
+        while chunk:
+            chunks.append(chunk)
+            chunk = self.read(self.part_size)
+        return b''.join(chunks)
+
+    def close(self):
+        if not self.closed:
+            for future in self._pending:
+                future.cancel()
+            self._pending.clear()
+            self._executor.shutdown(wait=False)
+            self._part = b''
+        super().close()
+
+    def _next_part(self):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        if self.size is None:
+            self._part = self._get_first_part()
+        elif self._pending:
+            self._part = self._pending.popleft().result()
+        else:
+            return False
+        self._part_pos = 0
+        self._prefetch()
+        return bool(self._part)
+
+    def _prefetch(self):
+        while len(self._pending) < self.depth and self._next_offset < self.size:
+            end = min(self._next_offset + self.part_size, self.size)
+            self._pending.append(self._executor.submit(self._get_range, self._next_offset, end))
+            self._next_offset = end
+
+    def _get_first_part(self):
+        try:
+            response = self._get_object(Range=f"bytes=0-{self.part_size - 1}")
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'InvalidRange':
+                raise
+            # ranges are not satisfiable on an empty object
+            self.size = 0
+            return b''
+        content_range = response.get('ContentRange')
+        if content_range:
+            self.size = int(self._content_range.match(content_range).group(3))
+        else:
+            self.size = response['ContentLength']
+        self.etag = response.get('ETag')
+        part = response['Body'].read()
+        self._next_offset = len(part)
+        return part
+
+    def _get_range(self, start, end):
+        response = self._get_object(Range=f"bytes={start}-{end - 1}", IfMatch=self.etag)
+        part = response['Body'].read()
+        if len(part) != end - start:
+            raise IOError(f"Expected {end - start} bytes at offset {start} of {self.key}, got {len(part)}")
+        return part
+
+    @retry(wait_fixed=1000, stop_max_attempt_number=3, retry_on_exception=_is_transient)
+    def _get_object(self, **kwargs):
+        kwargs = {k: v for k, v in kwargs.items() if v is not None}
+        return self.client.get_object(Bucket=self.bucket, Key=self.key, **kwargs)
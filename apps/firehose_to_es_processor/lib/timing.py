@@ -0,0 +1,84 @@
+import math
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+def percentile(values, p):
+    """The nearest-rank p-th percentile of values, or None if there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(p / 100.0 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class StageTimer:
+    """Accumulates the wall time and sizes of the stages of a streaming pipeline.
+
+    Stages that are generators feeding each other are timed with `timed_iter`, which only measures the time spent
+    producing each item. That time includes the stages upstream of it, so `exclusive` subtracts them again to tell
+    how long each stage took on its own.
+    """
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.sizes = defaultdict(int)
+        self.counts = defaultdict(int)
+
+    @contextmanager
+    def timed(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[stage] += time.perf_counter() - start
+
+    def add(self, stage, seconds):
+        self.seconds[stage] += seconds
+
+    def timed_iter(self, stage, iterable, size=None):
+        """Yields the items of iterable, timing how long each took to produce and summing size(item) if given."""
+        iterator = iter(iterable)
+        seconds = self.seconds
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                seconds[stage] += time.perf_counter() - start
+                return
+            seconds[stage] += time.perf_counter() - start
+            self.counts[stage] += 1
+            if size is not None:
+                self.sizes[stage] += size(item)
+            yield item
+
+    def timed_reader(self, stage, file):
+        return _TimedReader(self, stage, file)
+
+    def exclusive(self, nested_stages):
+        """The seconds of each of nested_stages on its own, given innermost first, with each stage timing the one
+        before it as part of its own time."""
+        exclusive = dict()
+        upstream = 0.0
+        for stage in nested_stages:
+            if stage in self.seconds:
+                inclusive = self.seconds[stage]
+                exclusive[stage] = max(inclusive - upstream, 0.0)
+                upstream = inclusive
+        return exclusive
+
+
+class _TimedReader:
+
+    def __init__(self, timer, stage, file):
+        self.timer = timer
+        self.stage = stage
+        self.file = file
+
+    def read(self, size=-1):
+        with self.timer.timed(self.stage):
+            data = self.file.read(size)
+        self.timer.sizes[self.stage] += len(data)
+        return data
@@ -0,0 +1,138 @@
+import multiprocessing
+import re
+import traceback
+from collections import deque
+
+from . import firehose_records
+from .bulk_request import BulkRequest
+from .json_object_stream import JsonBytesObjectStream
+
+_context = multiprocessing.get_context('forkserver')
+
+# The '}{' between two Firehose records, told apart from one ending a string value by the key that must follow it
+_record_seam = re.compile(rb'}\s*(?={"[^\s",:}\]])')
+
+
+def split_records(chunks, chunk_size):
+    """Regroups decompressed chunks of a Firehose file into runs of whole records of about chunk_size bytes.
+
+    A run is only cut where one record ends and the next begins, so each can be decoded on its own.
+    """
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        # runs are cut at an offset into the buffer, which is only compacted once per chunk
+        start = 0
+        while len(buffer) - start > chunk_size:
+            seam = _record_seam.search(buffer, start + chunk_size - 1)
+            if seam is None:
+                break
+            yield bytes(buffer[start:seam.start() + 1])
+            start = seam.end()
+        del buffer[:start]
+    if buffer.strip():
+        yield bytes(buffer)
+
+
+class TransformError(Exception):
+    pass
+
+
+class TransformPool:
+    """Decodes and transforms Firehose records into bulk request lines in `processes` worker processes.
+
+    The calling process only splits the decompressed file into runs of whole records and sends each run down a
+    Pipe to a worker, which returns the (action_line, source_line, index) lines of its log events. Pipes are used
+    rather than Queues or Pools because Lambda has no /dev/shm to back their semaphores. Each worker holds one run
+    at a time and runs are handed out round robin, so lines come back in file order.
+
+    Workers are started by a forkserver rather than forked from the calling process, whose prefetch, indexing and
+    Airbrake threads may hold locks that a forked child would inherit locked. The server imports this module and
+    the notifier factory's once, so workers start without importing them again. A `notifier_factory` given must
+    be picklable, and is called in each worker to count the errors in its log events; the notifiers are sent back
+    and collected in `notifiers` once the file is done, to be merged and notified on by the caller.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, processes, document_id=None, op_type='index', index_prefix=None, notifier_factory=None,
+                 chunk_size=CHUNK_SIZE):
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self.notifiers = []
+        self._worker_args = (document_id, op_type, index_prefix, notifier_factory)
+        self._workers = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def start(self):
+        notifier_factory = self._worker_args[-1]
+        # only takes effect before the forkserver is first started
+        _context.set_forkserver_preload([__name__] + ([notifier_factory.__module__] if notifier_factory else []))
+        for _ in range(self.processes):
+            conn, worker_conn = _context.Pipe()
+            process = _context.Process(target=_work, args=(worker_conn,) + self._worker_args, daemon=True)
+            process.start()
+            worker_conn.close()
+            self._workers.append((process, conn))
+
+    def transform(self, chunks):
+        """Yields the (action_line, source_line, index) lines of the log events in decompressed Firehose chunks."""
+        in_flight = deque()
+        for i, records in enumerate(split_records(chunks, self.chunk_size)):
+            if len(in_flight) == self.processes:
+                yield from self._receive(in_flight.popleft())
+            conn = self._workers[i % self.processes][1]
+            conn.send_bytes(records)
+            in_flight.append(conn)
+        while in_flight:
+            yield from self._receive(in_flight.popleft())
+        for _, conn in self._workers:
+            conn.send_bytes(b'')
+            self.notifiers.append(conn.recv())
+
+    def close(self):
+        for process, conn in self._workers:
+            # a worker still waiting on its pipe exits once the pipe is closed
+            conn.close()
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self._workers = []
+
+    @staticmethod
+    def _receive(conn):
+        try:
+            lines, error = conn.recv()
+        except EOFError:
+            raise TransformError("Transform worker exited unexpectedly")
+        if error is not None:
+            raise TransformError(error)
+        return lines
+
+
+def _work(conn, document_id, op_type, index_prefix, notifier_factory):
+    notifier = notifier_factory() if notifier_factory else None
+    try:
+        while True:
+            records = conn.recv_bytes()
+            if not records:
+                conn.send(notifier)
+                break
+            try:
+                log_event_stream = firehose_records.from_docs(JsonBytesObjectStream([records]))
+                if notifier:
+                    log_event_stream = notifier.notify_on_stream(log_event_stream)
+                conn.send((list(BulkRequest.to_lines(log_event_stream, document_id, op_type, index_prefix)), None))
+            except Exception:
+                conn.send((None, traceback.format_exc()))
+    except (EOFError, BrokenPipeError):
+        pass
+    finally:
+        conn.close()
@@ -1,27 +1,30 @@
 import json
 
+_decoder = json.JSONDecoder()
+
 
 def extract_json(message):
         """
             Returns extracted JSON if valid or None if not found or invalid from data string
 
+            Messages without an opening and a later closing brace are rejected with str.find, and otherwise the JSON is decoded
+            in place from the first brace. This accepts everything the bounds from extract_json_bounds would,
+            as well as objects whose string values contain braces.
+
             Args:
             data (string): Input log event data
 
             Output:
             dict
         """
-        json_bound_loci = extract_json_bounds(message)
-        beginning_index = json_bound_loci[0]
-        end_index = json_bound_loci[1]
-        if beginning_index is not None and end_index is not None:
-            try:
-                formatted_data = message[beginning_index:end_index + 1]
-                json_body = json.loads(formatted_data)
-                return json_body
-            except:
-                return {}
-        return {}
+        beginning_index = message.find('{')
+        if beginning_index == -1 or message.rfind('}', beginning_index) == -1:
+            return {}
+        try:
+            json_body, _ = _decoder.raw_decode(message, beginning_index)
+            return json_body
+        except (ValueError, RecursionError):
+            return {}
 
 
 def extract_json_bounds(message):
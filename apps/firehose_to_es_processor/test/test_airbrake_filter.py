@@ -0,0 +1,67 @@
+import os
+import sys
+import unittest
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+from lib.airbrake_filter import AirbrakeFilter
+
+
+class TestAirbrakeFilter(unittest.TestCase):
+
+    error_filter = AirbrakeFilter(
+        ['traceback', 'Error', r'fail(ed|ure)'],
+        ['Machine-readable error code', r'validation_errors?\b'],
+        ['/aws/cloudtrail/audit-and-data-access']
+    )
+
+    def test_is_error(self):
+        for message, log_group, expected in [
+            ("Traceback (most recent call last):", "/aws/lambda/app", True),
+            ("ERROR 500", "/aws/lambda/app", True),
+            ("all good", "/aws/lambda/app", False),
+            ("the request FAILED", "/aws/lambda/app", True),
+            ("the request fails", "/aws/lambda/app", False),
+            ("Traceback (most recent call last):", "/aws/cloudtrail/audit-and-data-access", False),
+            ("error: Machine-readable error code 12", "/aws/lambda/app", False),
+            ("error: machine-readable error code 12", "/aws/lambda/app", True),
+            ("error in validation_error field", "/aws/lambda/app", False),
+            ("error in validation_errorsx field", "/aws/lambda/app", True),
+        ]:
+            with self.subTest(message=message, log_group=log_group):
+                self.assertEqual(self.error_filter.is_error(message, log_group), expected)
+
+    def test_literals_and_expressions(self):
+        self.assertEqual(self.error_filter.whitelisted_literals, ('traceback', 'error'))
+        self.assertEqual(self.error_filter.blacklisted_literals, ('Machine-readable error code',))
+        self.assertIsNotNone(self.error_filter.whitelisted_regex)
+        self.assertIsNotNone(self.error_filter.blacklisted_regex)
+
+    def test_expressions_keep_case(self):
+        error_filter = AirbrakeFilter([r'Status \S+', r'fatal\Z'], [r'\Dcode'])
+        self.assertTrue(error_filter.is_whitelisted("status FAILED"))
+        self.assertFalse(error_filter.is_whitelisted("status  "))
+        self.assertTrue(error_filter.is_whitelisted("it was FATAL"))
+        self.assertTrue(error_filter.is_blacklisted("error code"))
+        self.assertFalse(error_filter.is_blacklisted("1code"))
+
+    def test_empty_lists(self):
+        error_filter = AirbrakeFilter([], [])
+        self.assertFalse(error_filter.is_whitelisted("error"))
+        self.assertFalse(error_filter.is_blacklisted("error"))
+        self.assertFalse(AirbrakeFilter(['error'], []).is_blacklisted("error"))
+
+    def test_from_config(self):
+        error_filter = AirbrakeFilter.from_config({
+            'airbrake_whitelisted_log_message_terms': ['error'],
+            'airbrake_blacklisted_log_message_strings': ['validation_errors'],
+            'airbrake_blacklisted_log_group_names': ['/aws/cloudtrail/audit-and-data-access'],
+        })
+        self.assertTrue(error_filter.is_error("error", "/aws/lambda/app"))
+        self.assertFalse(error_filter.is_error("validation_errors", "/aws/lambda/app"))
+        self.assertFalse(error_filter.is_error("error", "/aws/cloudtrail/audit-and-data-access"))
+
+
+if __name__ == '__main__':
+    unittest.main()
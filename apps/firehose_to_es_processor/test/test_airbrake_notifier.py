@@ -1,41 +1,42 @@
 import unittest
+from unittest import mock
 from lib.airbrake_notifier import AirbrakeNotifier
 
 
 class TestFirehoseRecord(unittest.TestCase):
 
-    def test_is_message_appropriate_for_airbrake(self):
+    def test_is_error(self):
         # whitelisted message term and non-blacklisted log group name
         message = "traceback: blah blah blah"
         log_group = "not_blacklisted"
-        flag = AirbrakeNotifier._is_message_appropriate_for_airbrake(message, log_group)
+        flag = AirbrakeNotifier.error_filter.is_error(message, log_group)
         self.assertEqual(flag, True)
 
         # non whitelisted message term and non-blacklisted log group name
         message = "blah blah blah"
         log_group = "not_blacklisted"
-        flag = AirbrakeNotifier._is_message_appropriate_for_airbrake(message, log_group)
+        flag = AirbrakeNotifier.error_filter.is_error(message, log_group)
         self.assertEqual(flag, False)
 
         # whitelisted message term and blacklisted log group name
         message = "traceback: blah blah blah"
         log_group = "/aws/cloudtrail/audit-and-data-access"
-        flag = AirbrakeNotifier._is_message_appropriate_for_airbrake(message, log_group)
+        flag = AirbrakeNotifier.error_filter.is_error(message, log_group)
         self.assertEqual(flag, False)
 
         # non whitelisted message term and blacklisted log group name
         message = "blah blah blah"
         log_group = "/aws/cloudtrail/audit-and-data-access"
-        flag = AirbrakeNotifier._is_message_appropriate_for_airbrake(message, log_group)
+        flag = AirbrakeNotifier.error_filter.is_error(message, log_group)
         self.assertEqual(flag, False)
 
     def test_string_blacklist(self):
         message = "traceback: blah blah blah"
-        flag = AirbrakeNotifier._contains_blacklisted_string(message)
+        flag = AirbrakeNotifier.error_filter.is_blacklisted(message)
         self.assertEqual(flag, False)
 
         message = "blah blah Machine-readable error code blah blah"
-        flag = AirbrakeNotifier._contains_blacklisted_string(message)
+        flag = AirbrakeNotifier.error_filter.is_blacklisted(message)
         self.assertEqual(flag, True)
 
     def test_report(self):
@@ -65,3 +66,31 @@ class TestFirehoseRecord(unittest.TestCase):
             ('not_blacklisted2', 'errors', 1),
             ('not_blacklisted2', 'total', 1),
         })
+
+    def test_merge(self):
+        notifier = AirbrakeNotifier()
+        notifier.notify({'@message': "traceback: 1", '@log_group': "log_group_a", '@log_stream': 'some-stream'})
+        other = AirbrakeNotifier()
+        for message, log_group in [("traceback: 2", "log_group_a"), ("hi!", "log_group_a"), ("hi!", "log_group_b")]:
+            other.notify({'@message': message, '@log_group': log_group, '@log_stream': 'some-stream'})
+        notifier.merge(other)
+        self.assertEqual(notifier._report, {
+            "log_group_a": {'errors': 2, 'total': 3},
+            "log_group_b": {'errors': 0, 'total': 1},
+        })
+        self.assertEqual(notifier._total_errors, 2)
+        self.assertEqual([error[:2] for _, error in notifier.errors.items()], [[2, "log_group_a"]])
+
+    def test_notify_errors(self):
+        notifier = AirbrakeNotifier()
+        for i in range(100):
+            notifier.notify({'@message': f"traceback: request {i} failed", '@log_group': "noisy",
+                             '@log_stream': 'some-stream'})
+        notifier.notify({'@message': "traceback: KeyError", '@log_group': "quiet", '@log_stream': 'some-stream'})
+        with mock.patch.object(AirbrakeNotifier, 'sender') as sender:
+            sender.rate_limited = False
+            notifier.notify_errors()
+        self.assertEqual([c[0][0] for c in sender.send.call_args_list], [
+            "'noisy traceback: request 0 failed '@log_stream': some-stream (100 occurrences)",
+            "'quiet traceback: KeyError '@log_stream': some-stream",
+        ])
@@ -0,0 +1,99 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+from lib.airbrake_sender import AirbrakeSender
+from lib.error_fingerprint import fingerprint
+
+
+class FakeAirbrake:
+
+    def __init__(self, latency=0.0, errors=()):
+        self.latency = latency
+        self.errors = list(errors)
+        self.notified = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def notify(self, error_str):
+        self.release.wait()
+        time.sleep(self.latency)
+        if self.errors:
+            error = self.errors.pop(0)
+            if error:
+                raise error
+        self.notified.append(error_str)
+
+
+class TestAirbrakeSender(unittest.TestCase):
+
+    def test_send_does_not_wait_for_airbrake(self):
+        airbrake = FakeAirbrake(latency=0.05)
+        sender = AirbrakeSender(airbrake)
+        start = time.monotonic()
+        for i in range(10):
+            self.assertTrue(sender.send(f"error {i}", i))
+        self.assertLess(time.monotonic() - start, 0.05)
+        sender.flush()
+        self.assertEqual(airbrake.notified, [f"error {i}" for i in range(10)])
+
+    def test_duplicates(self):
+        airbrake = FakeAirbrake()
+        sender = AirbrakeSender(airbrake)
+        for i in range(5):
+            sender.send(f"KeyError in request {i}", fingerprint("/aws/lambda/app", f"KeyError in request {i}"))
+        sender.send("ValueError", fingerprint("/aws/lambda/app", "ValueError"))
+        self.assertEqual(sender.num_duplicates, 4)
+        sender.flush()
+        self.assertEqual(airbrake.notified, ["KeyError in request 0", "ValueError"])
+        # deduplication starts over after a flush
+        self.assertTrue(sender.send("KeyError in request 9", fingerprint("/aws/lambda/app", "KeyError in request 9")))
+        sender.flush()
+        self.assertEqual(len(airbrake.notified), 3)
+
+    def test_bounded(self):
+        airbrake = FakeAirbrake()
+        airbrake.release.clear()
+        sender = AirbrakeSender(airbrake, max_pending=2)
+        queued = [sender.send(f"error {i}", i) for i in range(10)]
+        # one notification may already have been taken off the queue by the sender thread
+        self.assertIn(queued.count(True), [2, 3])
+        self.assertEqual(sender.num_dropped, queued.count(False))
+        airbrake.release.set()
+        sender.flush()
+        self.assertEqual(len(airbrake.notified), queued.count(True))
+
+    def test_rate_limited(self):
+        airbrake = FakeAirbrake(errors=[None, Exception("420 Client Error: Enhance Your Calm")])
+        sender = AirbrakeSender(airbrake)
+        for i in range(5):
+            sender.send(f"error {i}", i)
+        sender.flush()
+        self.assertEqual(airbrake.notified, ["error 0"])
+        self.assertFalse(sender.rate_limited)
+        sender.send("error 5", 5)
+        sender.flush()
+        self.assertEqual(airbrake.notified, ["error 0", "error 5"])
+
+    def test_flush_timeout(self):
+        airbrake = FakeAirbrake()
+        airbrake.release.clear()
+        sender = AirbrakeSender(airbrake)
+        sender.send("error", 0)
+        start = time.monotonic()
+        with self.assertLogs('lib.airbrake_sender', 'WARNING'):
+            sender.flush(timeout=0.1)
+        self.assertLess(time.monotonic() - start, 1)
+        airbrake.release.set()
+
+    def test_flush_without_notifications(self):
+        AirbrakeSender(FakeAirbrake()).flush()
+
+
+if __name__ == '__main__':
+    unittest.main()
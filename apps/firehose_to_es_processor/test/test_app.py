@@ -0,0 +1,126 @@
+import gzip
+import io
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+from botocore.exceptions import ClientError
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+import app
+from lib.bulk_request import BulkResult
+from lib.s3_client import S3Client
+
+
+def s3_event(*keys, bucket="logs-bucket"):
+    return {'Records': [
+        {'awsRegion': "us-east-1", 's3': {'bucket': {'name': bucket}, 'object': {'key': key}}} for key in keys
+    ]}
+
+
+class TestHandler(unittest.TestCase):
+
+    def setUp(self):
+        patches = [
+            mock.patch.object(app, 'S3Client'),
+            mock.patch.object(app, 'ESClient'),
+            mock.patch.object(app, 'FILE_CONCURRENCY', 3),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    @staticmethod
+    def _processed(s3_client, es_client, s3_object_key):
+        return dict(s3_object_key=s3_object_key, status='processed')
+
+    def test_files_processed_concurrently(self):
+        lock = threading.Lock()
+        active = []
+        max_active = []
+
+        def process_file(s3_client, es_client, s3_object_key):
+            with lock:
+                active.append(s3_object_key)
+                max_active.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.remove(s3_object_key)
+            return self._processed(s3_client, es_client, s3_object_key)
+
+        with mock.patch.object(app, 'process_file', side_effect=process_file):
+            result = app.handler(s3_event(*[f"firehose/{i}" for i in range(6)]), None)
+        self.assertEqual([r['s3_object_key'] for r in result['results']], [f"firehose/{i}" for i in range(6)])
+        self.assertEqual(max(max_active), 3)
+        app.S3Client.assert_called_once_with("us-east-1", "logs-bucket")
+        app.ESClient.assert_called_once_with()
+
+    def test_failure_is_isolated(self):
+        def process_file(s3_client, es_client, s3_object_key):
+            if s3_object_key == "firehose/bad":
+                raise ValueError("bad file")
+            return self._processed(s3_client, es_client, s3_object_key)
+
+        with mock.patch.object(app, 'process_file', side_effect=process_file) as process:
+            with self.assertRaises(app.FileProcessingError) as context:
+                app.handler(s3_event("firehose/1", "firehose/bad", "firehose/2"), None)
+        self.assertEqual(process.call_count, 3)
+        self.assertIn("Failed to process 1 of 3 files: firehose/bad (bad file)", str(context.exception))
+
+    def test_missing_file_skipped(self):
+        def process_file(s3_client, es_client, s3_object_key):
+            if s3_object_key == "firehose/done":
+                raise ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+            return self._processed(s3_client, es_client, s3_object_key)
+
+        with mock.patch.object(app, 'process_file', side_effect=process_file):
+            result = app.handler(s3_event("firehose/done", "firehose/1", "dead-letter/firehose/0.ndjson"), None)
+        self.assertEqual(sorted((r['s3_object_key'], r['status']) for r in result['results']), [
+            ("dead-letter/firehose/0.ndjson", 'skipped'),
+            ("firehose/1", 'processed'),
+            ("firehose/done", 'skipped'),
+        ])
+
+
+class TestProcessFile(unittest.TestCase):
+
+    def test_process_file(self):
+        with open(os.path.join(pkg_root, "test/data/file.txt.gz"), 'rb') as fh:
+            compressed = fh.read()
+        s3_client = mock.Mock()
+        s3_client.open_file.return_value = io.BytesIO(compressed)
+        s3_client.gunzip_chunks = S3Client.gunzip_chunks
+        es_client = mock.Mock()
+
+        def post_bulk_request(bulk_request):
+            result = BulkResult()
+            result.num_indexed = bulk_request.num_docs
+            return result
+
+        es_client.post_bulk_request.side_effect = post_bulk_request
+        with mock.patch.object(app, 'AIRBRAKE_ENABLED', False), \
+                mock.patch.object(app, 'ES_DEAD_LETTER_PATH', None), \
+                self.assertLogs(app.logger, 'INFO') as logs:
+            result = app.process_file(s3_client, es_client, "firehose/file")
+        self.assertEqual(result['status'], 'processed')
+        self.assertEqual(result['num_indexed'], result['num_docs'])
+        s3_client.delete_file.assert_called_once_with("firehose/file")
+
+        timings = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(timings['s3_object_key'], "firehose/file")
+        self.assertEqual(list(timings['seconds']), [
+            'fetch', 'gunzip', 'split', 'transform', 'bulk_build', 'bulk_post', 'dead_letters', 'delete'])
+        self.assertEqual(timings['compressed_bytes'], len(compressed))
+        self.assertEqual(timings['bytes'], len(gzip.decompress(compressed)))
+        self.assertEqual(timings['events'], result['num_docs'])
+        self.assertIsNotNone(timings['bulk_latency_p99'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import os
+import sys
+import unittest
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+import requests
+from botocore.credentials import Credentials
+
+from lib import aws_es
+
+
+class TestAwsEs(unittest.TestCase):
+
+    def test_get_region(self):
+        self.assertEqual(aws_es.get_region("search-logs-abc123.us-east-1.es.amazonaws.com"), "us-east-1")
+
+    def test_sign(self):
+        auth = aws_es.SigV4RequestsAuth('us-east-1', Credentials('access', 'secret', 'token'))
+        request = requests.Request(
+            'POST',
+            "https://search-logs-abc123.us-east-1.es.amazonaws.com/cwl-2018-06-08/fromFirehose/_bulk",
+            data=b'{"index":{}}\n{"@message":"hello"}\n',
+            auth=auth
+        ).prepare()
+        self.assertTrue(request.headers['Authorization'].startswith(
+            'AWS4-HMAC-SHA256 Credential=access/'))
+        self.assertIn('/us-east-1/es/aws4_request', request.headers['Authorization'])
+        self.assertEqual(request.headers['X-Amz-Security-Token'], 'token')
+        self.assertIn('X-Amz-Date', request.headers)
+
+    def test_reused(self):
+        self.assertIs(aws_es.get_http_session(), aws_es.get_http_session())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+from lib.bulk_indexer import BulkIndexer
+from lib.bulk_request import BulkItemFailure, BulkRequest, BulkResult
+from lib.dead_letters import DeadLetters
+
+
+class FakeESClient:
+
+    def __init__(self, delay=0.02, fail_on=None):
+        self.delay = delay
+        self.fail_on = fail_on
+        self.posted = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def post_bulk_request(self, bulk_request, prefix="cwl"):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if bulk_request is self.fail_on:
+                raise RuntimeError("bulk request failed")
+            with self._lock:
+                self.posted.append(bulk_request)
+            result = BulkResult()
+            for _, source_line in bulk_request.items():
+                if b'rejected' in source_line:
+                    result.failures.append(BulkItemFailure(400, {'type': 'mapper_parsing_exception'}, source_line))
+                else:
+                    result.num_indexed += 1
+            return result
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class TestBulkIndexer(unittest.TestCase):
+
+    @staticmethod
+    def _bulk_requests(num_requests, docs_per_request=5):
+        docs = [{"@message": str(i)} for i in range(num_requests * docs_per_request)]
+        return list(BulkRequest.from_docs(docs, max_docs=docs_per_request))
+
+    def test_index(self):
+        bulk_requests = self._bulk_requests(10)
+        es_client = FakeESClient()
+        stats = BulkIndexer(es_client, concurrency=3).index(iter(bulk_requests))
+        self.assertCountEqual(es_client.posted, bulk_requests)
+        self.assertEqual(es_client.max_in_flight, 3)
+        self.assertEqual(stats.num_requests, 10)
+        self.assertEqual(stats.num_docs, 50)
+        self.assertEqual(stats.num_bytes, sum(r.num_bytes for r in bulk_requests))
+        self.assertEqual(len(stats.latencies), 10)
+        self.assertGreater(stats.docs_per_second, 0)
+
+    def test_builds_while_posting(self):
+        bulk_requests = self._bulk_requests(4)
+        es_client = FakeESClient(delay=0.05)
+        in_flight_while_building = []
+
+        def build():
+            for bulk_request in bulk_requests:
+                time.sleep(0.01)
+                in_flight_while_building.append(es_client.in_flight)
+                yield bulk_request
+
+        BulkIndexer(es_client, concurrency=1).index(build())
+        self.assertEqual(max(in_flight_while_building), 1)
+
+    def test_dead_letters(self):
+        docs = [{"@message": "ok"}, {"@message": "rejected"}, {"@message": "ok"}, {"@message": "rejected"}]
+        dead_letters = DeadLetters(write=None)
+        stats = BulkIndexer(FakeESClient(), dead_letters=dead_letters).index(BulkRequest.from_docs(docs, max_docs=2))
+        self.assertEqual(stats.num_indexed, 2)
+        self.assertEqual(stats.num_failed, 2)
+        self.assertEqual(len(dead_letters), 2)
+
+    def test_error(self):
+        bulk_requests = self._bulk_requests(6)
+        es_client = FakeESClient(fail_on=bulk_requests[2])
+        with self.assertRaises(RuntimeError):
+            BulkIndexer(es_client, concurrency=2).index(iter(bulk_requests))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import json
+import os
+import sys
+import unittest
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+from lib.bulk_request import BulkRequest, hashed_event_id
+
+
+class TestBulkRequest(unittest.TestCase):
+
+    docs = [{"@message": "message {:03d} é".format(i), "@id": "{:03d}".format(i)} for i in range(100)]
+
+    def test_body(self):
+        requests = list(BulkRequest.from_docs(self.docs))
+        self.assertEqual(len(requests), 1)
+        request = requests[0]
+        body = request.body
+        self.assertEqual(len(body), request.num_bytes)
+        self.assertEqual(len(request), 100)
+        lines = body.decode('utf-8').split('\n')
+        self.assertEqual(lines[-1], '')
+        self.assertEqual([json.loads(line) for line in lines[0:-1:2]], [{"index": {}}] * 100)
+        self.assertEqual([json.loads(line) for line in lines[1:-1:2]], self.docs)
+
+    def test_max_docs(self):
+        requests = list(BulkRequest.from_docs(self.docs, max_docs=30))
+        self.assertEqual([len(r) for r in requests], [30, 30, 30, 10])
+
+    def test_max_bytes(self):
+        doc_bytes = next(BulkRequest.from_docs(self.docs[:1])).num_bytes
+        requests = list(BulkRequest.from_docs(self.docs, max_bytes=doc_bytes * 10 + 5))
+        self.assertEqual([len(r) for r in requests], [10] * 10)
+        for request in requests:
+            self.assertLessEqual(request.num_bytes, doc_bytes * 10 + 5)
+            self.assertEqual(len(request.body), request.num_bytes)
+
+    def test_oversized_doc(self):
+        docs = [{"@message": "small"}, {"@message": "x" * 1000}, {"@message": "small"}]
+        requests = list(BulkRequest.from_docs(docs, max_bytes=100))
+        self.assertEqual([len(r) for r in requests], [1, 1, 1])
+
+    def test_document_ids(self):
+        docs = [{"@id": "35000000000000000000000000000000000000000000000000000001", "@message": "one"}]
+        for document_id, op_type, expected in [
+            ('event_id', 'index', {"index": {"_id": "35000000000000000000000000000000000000000000000000000001"}}),
+            ('hash', 'create', {"create": {"_id": hashed_event_id(docs[0])}}),
+        ]:
+            with self.subTest(document_id=document_id, op_type=op_type):
+                request = next(BulkRequest.from_docs(docs, document_id=document_id, op_type=op_type))
+                action_line, source_line = next(request.items())
+                self.assertEqual(json.loads(action_line), expected)
+                self.assertEqual(json.loads(source_line), docs[0])
+
+    def test_index_routing(self):
+        docs = [
+            {"@id": "1", "@timestamp": "2018-06-08T23:59:59.999Z"},
+            {"@id": "2", "@timestamp": "2018-06-09T00:00:00.000Z"},
+            {"@id": "3", "@timestamp": "2018-06-08T12:00:00.000Z"},
+        ]
+        request = next(BulkRequest.from_docs(docs, index_prefix="cwl"))
+        self.assertEqual(request.indices, {"cwl-2018-06-08", "cwl-2018-06-09"})
+        self.assertEqual([json.loads(action_line) for action_line, _ in request.items()], [
+            {"index": {"_index": "cwl-2018-06-08"}},
+            {"index": {"_index": "cwl-2018-06-09"}},
+            {"index": {"_index": "cwl-2018-06-08"}},
+        ])
+        request = next(BulkRequest.from_docs(docs[:1], document_id='event_id', op_type='create', index_prefix="cwl"))
+        action_line, _ = next(request.items())
+        self.assertEqual(json.loads(action_line), {"create": {"_id": "1", "_index": "cwl-2018-06-08"}})
+
+    def test_no_routing(self):
+        request = next(BulkRequest.from_docs(self.docs))
+        self.assertEqual(request.indices, set())
+
+    def test_hashed_event_id(self):
+        self.assertEqual(len(hashed_event_id({"@id": "1"})), 22)
+        self.assertEqual(hashed_event_id({"@id": "1"}), hashed_event_id({"@id": 1}))
+        self.assertNotEqual(hashed_event_id({"@id": "1"}), hashed_event_id({"@id": "2"}))
+
+    def test_no_docs(self):
+        self.assertEqual(list(BulkRequest.from_docs([])), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
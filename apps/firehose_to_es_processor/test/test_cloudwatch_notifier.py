@@ -0,0 +1,118 @@
+import io
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+from lib.cloudwatch_notifier import MetricsBuffer, observe_counts
+
+
+class TestMetricsBuffer(unittest.TestCase):
+
+    def test_merges_dimension_sets(self):
+        metrics = MetricsBuffer()
+        for count in [3, 5, 3]:
+            metrics.add('By Type', [('CountType', 'errors')], count)
+        metrics.add('By Type', [('CountType', 'total')], 10)
+        self.assertEqual(len(metrics), 2)
+        with mock.patch('lib.cloudwatch_notifier.get_cloudwatch') as get_cloudwatch:
+            metrics.flush()
+        put_metric_data = get_cloudwatch.return_value.put_metric_data
+        put_metric_data.assert_called_once()
+        self.assertEqual(put_metric_data.call_args[1]['Namespace'], 'Logs')
+        self.assertEqual(put_metric_data.call_args[1]['MetricData'], [
+            {
+                'MetricName': 'By Type',
+                'Dimensions': [{'Name': 'CountType', 'Value': 'errors'}],
+                'StatisticValues': {'SampleCount': 3, 'Sum': 11, 'Minimum': 3, 'Maximum': 5},
+                'Unit': 'Count',
+                'StorageResolution': 60
+            },
+            {
+                'MetricName': 'By Type',
+                'Dimensions': [{'Name': 'CountType', 'Value': 'total'}],
+                'StatisticValues': {'SampleCount': 1, 'Sum': 10, 'Minimum': 10, 'Maximum': 10},
+                'Unit': 'Count',
+                'StorageResolution': 60
+            },
+        ])
+        self.assertEqual(len(metrics), 0)
+
+    def test_request_limits(self):
+        metrics = MetricsBuffer()
+        for i in range(2500):
+            metrics.add('By Log Group, by Type', [('LogGroup', f"group{i}"), ('CountType', 'total')], 1)
+        for value in range(200):
+            metrics.add('By Type', [('CountType', 'total')], value)
+        with mock.patch('lib.cloudwatch_notifier.get_cloudwatch') as get_cloudwatch:
+            metrics.flush()
+        calls = get_cloudwatch.return_value.put_metric_data.call_args_list
+        self.assertEqual(sorted(len(c[1]['MetricData']) for c in calls), [501, 1000, 1000])
+        by_type = [datum for c in calls for datum in c[1]['MetricData'] if datum['MetricName'] == 'By Type']
+        self.assertEqual([datum['StatisticValues'] for datum in by_type], [
+            {'SampleCount': 200, 'Sum': 19900, 'Minimum': 0, 'Maximum': 199}
+        ])
+
+    def test_flush_empty(self):
+        with mock.patch('lib.cloudwatch_notifier.get_cloudwatch') as get_cloudwatch:
+            MetricsBuffer().flush()
+        get_cloudwatch.assert_not_called()
+
+    def test_publish_failure_logged(self):
+        metrics = MetricsBuffer()
+        metrics.add('By Type', [('CountType', 'total')], 1)
+        with mock.patch('lib.cloudwatch_notifier.get_cloudwatch') as get_cloudwatch, \
+                self.assertLogs('lib.cloudwatch_notifier', 'ERROR'):
+            get_cloudwatch.return_value.put_metric_data.side_effect = Exception("throttled")
+            metrics.flush()
+
+    def test_emf(self):
+        stream = io.StringIO()
+        metrics = MetricsBuffer(publisher='emf', stream=stream)
+        metrics.add('By Log Group, by Type', [('LogGroup', 'group'), ('CountType', 'errors')], 2)
+        metrics.add('By Log Group, by Type', [('LogGroup', 'group'), ('CountType', 'errors')], 2)
+        for value in range(150):
+            metrics.add('By Type', [('CountType', 'total')], value)
+        with mock.patch('lib.cloudwatch_notifier.get_cloudwatch') as get_cloudwatch:
+            metrics.flush()
+        get_cloudwatch.assert_not_called()
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[0]['_aws']['CloudWatchMetrics'], [{
+            'Namespace': 'Logs',
+            'Dimensions': [['LogGroup', 'CountType']],
+            'Metrics': [{'Name': 'By Log Group, by Type', 'Unit': 'Count'}]
+        }])
+        self.assertEqual(lines[0]['LogGroup'], 'group')
+        self.assertEqual(lines[0]['CountType'], 'errors')
+        self.assertEqual(lines[0]['By Log Group, by Type'], [2, 2])
+        self.assertEqual([len(line['By Type']) for line in lines[1:]], [100, 50])
+
+    def test_unknown_publisher(self):
+        with self.assertRaises(ValueError):
+            MetricsBuffer(publisher='statsd')
+
+
+class TestObserveCounts(unittest.TestCase):
+
+    def test_observe_counts(self):
+        metrics = MetricsBuffer()
+        observe_counts([('group1', 'errors', 2), ('group1', 'total', 3), ('group2', 'total', 4)], metrics)
+        observe_counts([('group1', 'errors', 2)], metrics)
+        data = {(d['MetricName'], tuple(dim['Value'] for dim in d['Dimensions'])): d['StatisticValues']['Sum']
+                for d in metrics.metric_data(metrics._metrics)}
+        self.assertEqual(data, {
+            ('By Log Group, by Type', ('group1', 'errors')): 4,
+            ('By Log Group, by Type', ('group1', 'total')): 3,
+            ('By Log Group, by Type', ('group2', 'total')): 4,
+            ('By Type', ('errors',)): 4,
+            ('By Type', ('total',)): 7,
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+from lib.bulk_request import BulkItemFailure
+from lib.dead_letters import DeadLetters
+
+
+class FakeS3Client:
+
+    def __init__(self):
+        self.files = {}
+
+    def put_file(self, s3_object_key, body):
+        self.files[s3_object_key] = body
+
+
+class TestDeadLetters(unittest.TestCase):
+
+    failures = [
+        BulkItemFailure(400, {'type': 'mapper_parsing_exception'}, b'{"@message":"one"}\n'),
+        BulkItemFailure(429, {'type': 'es_rejected_execution_exception'}, b'{"@message":"two"}\n'),
+    ]
+
+    def test_s3_dead_letters(self):
+        s3_client = FakeS3Client()
+        dead_letters = DeadLetters.to_s3(s3_client, 'dead-letter/')
+        dead_letters.flush('firehose/2018/01/01/file')
+        self.assertEqual(s3_client.files, {})
+        dead_letters.add(self.failures)
+        dead_letters.flush('firehose/2018/01/01/file')
+        self.assertEqual(len(dead_letters), 0)
+        body = s3_client.files['dead-letter/firehose/2018/01/01/file.ndjson']
+        lines = [json.loads(line) for line in body.decode('utf-8').splitlines()]
+        self.assertEqual(lines, [
+            {
+                's3_object_key': 'firehose/2018/01/01/file',
+                'status': 400,
+                'error': {'type': 'mapper_parsing_exception'},
+                'source': {'@message': 'one'}
+            },
+            {
+                's3_object_key': 'firehose/2018/01/01/file',
+                'status': 429,
+                'error': {'type': 'es_rejected_execution_exception'},
+                'source': {'@message': 'two'}
+            },
+        ])
+
+    def test_file_dead_letters(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'dead-letters.ndjson')
+            dead_letters = DeadLetters.to_file(path)
+            for key in ['file1', 'file2']:
+                dead_letters.add(self.failures[:1])
+                dead_letters.flush(key)
+            with open(path) as fh:
+                lines = [json.loads(line) for line in fh]
+        self.assertEqual([line['s3_object_key'] for line in lines], ['file1', 'file2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
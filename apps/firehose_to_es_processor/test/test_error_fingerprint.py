@@ -0,0 +1,84 @@
+import os
+import sys
+import unittest
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+from lib.error_fingerprint import ErrorCounts, fingerprint, normalize
+
+
+class TestFingerprint(unittest.TestCase):
+
+    def test_normalize(self):
+        for message, expected in [
+            ("took 123ms on 4 tries", "took <n>ms on <n> tries"),
+            ("GET /v1/bundles/7ef8966b-45ef-4e0a-a51b-44a865372050 failed",
+             "GET /v1/bundles/<uuid> failed"),
+            ("2018-06-08T23:03:33.785338Z ERROR timeout", "<timestamp> ERROR timeout"),
+            ("2018-06-08 00:00:00,000 - app - ERROR", "<timestamp> - app - ERROR"),
+            ("RequestId: 0123abcd99 Error", "RequestId: <hex> Error"),
+            ("deadbeef is not a number", "deadbeef is not a number"),
+            ("0.5 seconds", "<n> seconds"),
+        ]:
+            with self.subTest(message=message):
+                self.assertEqual(normalize(message), expected)
+
+    def test_fingerprint(self):
+        self.assertEqual(fingerprint("group", "took 123ms on 4 tries"), fingerprint("group", "took 9ms on 12 tries"))
+        self.assertNotEqual(fingerprint("group", "error"), fingerprint("other_group", "error"))
+        self.assertNotEqual(fingerprint("group", "KeyError"), fingerprint("group", "ValueError"))
+
+
+class TestErrorCounts(unittest.TestCase):
+
+    def test_add(self):
+        errors = ErrorCounts()
+        errors.add("group", "request 1 failed", "stream_a")
+        errors.add("group", "request 2 failed", "stream_b")
+        errors.add("group", "KeyError", "stream_a")
+        self.assertEqual(len(errors), 2)
+        self.assertEqual([error for _, error in errors.items()], [
+            [2, "group", "request 1 failed", "stream_a"],
+            [1, "group", "KeyError", "stream_a"],
+        ])
+
+    def test_bounded(self):
+        errors = ErrorCounts(max_fingerprints=3)
+        for message in ["KeyError", "ValueError", "TypeError", "KeyError", "IndexError"]:
+            errors.add("group", message, "stream")
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(errors.num_evicted, 1)
+        self.assertEqual([error[2] for _, error in errors.items()], ["TypeError", "KeyError", "IndexError"])
+
+    def test_merge(self):
+        errors = ErrorCounts()
+        errors.add("group", "request 1 failed", "stream")
+        other = ErrorCounts()
+        other.add("group", "request 2 failed", "stream", count=4)
+        other.add("other_group", "KeyError", "stream")
+        errors.merge(other)
+        self.assertEqual(sorted(error[:2] for _, error in errors.items()), [[1, "other_group"], [5, "group"]])
+
+    def test_most_common(self):
+        errors = ErrorCounts()
+        for i in range(10):
+            errors.add("noisy", f"error {'ABCDEFGHIJ'[i]}", "stream", count=100 - i)
+        errors.add("quiet", "KeyError", "stream", count=2)
+        errors.add("quiet", "ValueError", "stream", count=1)
+        errors.add("other", "TypeError", "stream", count=3)
+        selected = [(count, log_group, message) for _, count, log_group, message, _ in errors.most_common(5)]
+        self.assertEqual(selected, [
+            (100, "noisy", "error A"),
+            (3, "other", "TypeError"),
+            (2, "quiet", "KeyError"),
+            (99, "noisy", "error B"),
+            (1, "quiet", "ValueError"),
+        ])
+
+    def test_most_common_empty(self):
+        self.assertEqual(ErrorCounts().most_common(5), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
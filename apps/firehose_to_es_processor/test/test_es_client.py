@@ -3,10 +3,13 @@ import time
 import unittest
 
 from contextlib import contextmanager
+from unittest import mock
 
+from elasticsearch.exceptions import ConnectionTimeout, TransportError
 from lib.es_client import ESClient
 from elasticsearch.client import IndicesClient
 from lib import firehose_records
+from lib.bulk_request import BulkRequest
 
 
 class TestESClient(unittest.TestCase):
@@ -18,29 +21,43 @@ class TestESClient(unittest.TestCase):
     es = es_client.es
 
     @contextmanager
-    def new_index(self, index_name):
+    def new_index(self, index_name, other_index_names=()):
+        """Creates index_name for the test, then deletes it and any of other_index_names, such as indices bulk
+        requests create implicitly, that exist afterwards."""
         try:
             if self.es.indices.exists(index_name):
                 self.es_client.delete_index(index_name)
-            self.es_client.create_cwl_day_index(self.index_prefix)
+            self.es_client.create_index(index_name)
             yield index_name
         finally:
-            if self.es.indices.exists(index_name):
-                self.es_client.delete_index(index_name)
+            for name in {index_name, *other_index_names}:
+                if self.es.indices.exists(name):
+                    self.es_client.delete_index(name)
 
     def test_create_cwl_day_index(self):
         index_name = self.es_client._format_today_index_name(self.index_prefix)
         self.assertEqual(self.es.indices.exists(index_name), False)
-        with self.new_index(index_name) as index_name:
+        try:
+            self.es_client.create_cwl_day_index(self.index_prefix)
             self.assertEqual(self.es.indices.exists(index_name), True)
+        finally:
+            if self.es.indices.exists(index_name):
+                self.es_client.delete_index(index_name)
 
     def test_bulk_post(self):
-        index_name = self.es_client._format_today_index_name(self.index_prefix)
-        with self.new_index(index_name):
-            data = [{"owner": "test_owner", "logGroup": "/test/test_log_group", "logStream": "test_log_stream", "messageType": 'DATA_MESSAGE'}]
-            data[0]["logEvents"] = [{"id": 123456, "timestamp": 1519970297000, "message": 'with_json{"hi": "hello"}with_json'}, {"id": 123456, "timestamp": 1519970297000, "message": 'with_json{"hi": "hello"}with_json'}]
-            record_stream = firehose_records.from_docs(data)
-            output_records = list(record_stream)
+        # documents are routed to the daily index of their timestamp, 1519970297000 being 2018-03-02 UTC
+        index_name = f"{self.index_prefix}-2018-03-02"
+        data = [{"owner": "test_owner", "logGroup": "/test/test_log_group", "logStream": "test_log_stream", "messageType": 'DATA_MESSAGE'}]
+        data[0]["logEvents"] = [{"id": 123456, "timestamp": 1519970297000, "message": 'with_json{"hi": "hello"}with_json'}, {"id": 123456, "timestamp": 1519970297000, "message": 'with_json{"hi": "hello"}with_json'}]
+        record_stream = firehose_records.from_docs(data)
+        output_records = list(record_stream)
+        routed_index_names = set().union(*(
+            bulk_request.indices for bulk_request in BulkRequest.from_docs(output_records, index_prefix=self.index_prefix)
+        ))
+        self.assertEqual(routed_index_names, {index_name})
+        # documents without a routed index would go to today's
+        today_index_name = self.es_client._format_today_index_name(self.index_prefix)
+        with self.new_index(index_name, routed_index_names | {today_index_name}):
             self.es_client.bulk_post(output_records, self.index_prefix)
             count = 0
             countdown = 10
@@ -77,3 +94,163 @@ class TestESClient(unittest.TestCase):
             'value'
         })
         self.assertEqual(len(tokens), 14)
+
+
+class TestBulkItemErrors(unittest.TestCase):
+
+    @staticmethod
+    def _item(status, error_type=None):
+        info = {'status': status}
+        if error_type:
+            info['error'] = {'type': error_type, 'reason': error_type}
+        return {'index': info}
+
+    def test_post_bulk_request_retries_only_rejected_documents(self):
+        docs = [{"@message": str(i)} for i in range(4)]
+        bulk_request = next(BulkRequest.from_docs(docs))
+        responses = [
+            {'errors': True, 'items': [
+                self._item(201),
+                self._item(429, 'es_rejected_execution_exception'),
+                self._item(400, 'mapper_parsing_exception'),
+                self._item(429, 'es_rejected_execution_exception'),
+            ]},
+            {'errors': True, 'items': [
+                self._item(201),
+                self._item(429, 'es_rejected_execution_exception'),
+            ]},
+            {'errors': False, 'items': [
+                self._item(201),
+            ]},
+        ]
+        es_client = ESClient()
+        with mock.patch.object(es_client.es.transport, 'perform_request', side_effect=responses) as perform, \
+                mock.patch('time.sleep'):
+            result = es_client.post_bulk_request(bulk_request)
+        bodies = [c[1]['body'] for c in perform.call_args_list]
+        self.assertEqual(bodies[1], b'{"index":{}}\n{"@message":"1"}\n{"index":{}}\n{"@message":"3"}\n')
+        self.assertEqual(bodies[2], b'{"index":{}}\n{"@message":"3"}\n')
+        self.assertEqual(result.num_indexed, 3)
+        self.assertEqual(result.num_retried, 3)
+        self.assertEqual(result.num_failed, 1)
+        self.assertEqual(result.failures[0].status, 400)
+        self.assertEqual(result.failures[0].source_line, b'{"@message":"2"}\n')
+
+    def test_post_bulk_request_counts_existing_documents(self):
+        docs = [{"@id": str(i), "@message": str(i)} for i in range(2)]
+        bulk_request = next(BulkRequest.from_docs(docs, document_id='event_id', op_type='create'))
+        response = {'errors': True, 'items': [
+            {'create': {'status': 201}},
+            {'create': {'status': 409, 'error': {'type': 'version_conflict_engine_exception'}}},
+        ]}
+        es_client = ESClient()
+        with mock.patch.object(es_client.es.transport, 'perform_request', return_value=response):
+            result = es_client.post_bulk_request(bulk_request)
+        self.assertEqual(result.num_indexed, 1)
+        self.assertEqual(result.num_existing, 1)
+        self.assertEqual(result.num_failed, 0)
+
+    def test_post_bulk_request_creates_missing_index(self):
+        bulk_request = next(BulkRequest.from_docs([{"@message": "one"}]))
+        responses = [
+            {'errors': True, 'items': [
+                {'index': {'_index': 'cwl-2018-06-08', 'status': 404,
+                           'error': {'type': 'index_not_found_exception'}}},
+            ]},
+            {'errors': False, 'items': [
+                {'index': {'_index': 'cwl-2018-06-08', 'status': 201}},
+            ]},
+        ]
+        es_client = ESClient()
+        with mock.patch.object(es_client.es.transport, 'perform_request', side_effect=responses), \
+                mock.patch.object(es_client, 'create_index') as create_index, \
+                mock.patch('time.sleep') as sleep:
+            result = es_client.post_bulk_request(bulk_request)
+        create_index.assert_called_once_with('cwl-2018-06-08')
+        sleep.assert_not_called()
+        self.assertEqual(result.num_indexed, 1)
+
+    def test_post_bulk_request_dead_letters_refused_request(self):
+        bulk_request = next(BulkRequest.from_docs([{"@message": "one"}, {"@message": "two"}]))
+        es_client = ESClient()
+        error = TransportError(413, 'Request Entity Too Large', {})
+        with mock.patch.object(es_client.es.transport, 'perform_request', side_effect=error) as perform, \
+                mock.patch('time.sleep'):
+            result = es_client.post_bulk_request(bulk_request)
+        perform.assert_called_once()
+        self.assertEqual(result.num_indexed, 0)
+        self.assertEqual([failure.status for failure in result.failures], [413, 413])
+        self.assertEqual(result.failures[1].source_line, b'{"@message":"two"}\n')
+
+    def test_post_bulk_request_raises_refused_request(self):
+        bulk_request = next(BulkRequest.from_docs([{"@message": "one"}]))
+        for error in [TransportError(403, 'Forbidden', {}), TransportError(404, 'Not Found', {})]:
+            with self.subTest(error=error):
+                es_client = ESClient()
+                with mock.patch.object(es_client.es.transport, 'perform_request', side_effect=error) as perform, \
+                        mock.patch('time.sleep'):
+                    with self.assertRaises(TransportError):
+                        es_client.post_bulk_request(bulk_request)
+                perform.assert_called_once()
+
+    def test_post_bulk_request_retries_transient_errors(self):
+        bulk_request = next(BulkRequest.from_docs([{"@message": "one"}]))
+        response = {'errors': False, 'items': [{'index': {'status': 201}}]}
+        for error in [ConnectionTimeout('TIMEOUT', 'timed out', None), TransportError(503, 'unavailable', {}),
+                      TransportError(429, 'too many requests', {})]:
+            with self.subTest(error=error):
+                es_client = ESClient()
+                with mock.patch.object(es_client.es.transport, 'perform_request',
+                                       side_effect=[error, response]) as perform, \
+                        mock.patch('time.sleep'):
+                    result = es_client.post_bulk_request(bulk_request)
+                self.assertEqual(perform.call_count, 2)
+                self.assertEqual(result.num_indexed, 1)
+
+    def test_post_bulk_request_raises_persistent_transient_errors(self):
+        bulk_request = next(BulkRequest.from_docs([{"@message": "one"}]))
+        es_client = ESClient()
+        with mock.patch.object(es_client.es.transport, 'perform_request',
+                               side_effect=TransportError(502, 'bad gateway', {})) as perform, \
+                mock.patch('time.sleep'):
+            with self.assertRaises(TransportError):
+                es_client.post_bulk_request(bulk_request)
+        self.assertEqual(perform.call_count, 3)
+
+
+class TestIndexCache(unittest.TestCase):
+
+    def setUp(self):
+        ESClient._known_indices.clear()
+        ESClient._templates.clear()
+        self.es_client = ESClient()
+
+    def tearDown(self):
+        ESClient._known_indices.clear()
+        ESClient._templates.clear()
+
+    def test_create_index_once(self):
+        with mock.patch.object(self.es_client.es.indices, 'exists', return_value=False) as exists, \
+                mock.patch.object(self.es_client.es.indices, 'create') as create:
+            self.es_client.create_index('cwl-2018-06-08')
+            self.es_client.create_index('cwl-2018-06-08')
+            self.assertEqual(exists.call_count, 1)
+            self.assertEqual(create.call_count, 1)
+            with mock.patch('time.monotonic', return_value=time.monotonic() + ESClient.INDEX_CACHE_TTL + 1):
+                self.es_client.create_index('cwl-2018-06-08')
+            self.assertEqual(exists.call_count, 2)
+
+    def test_delete_index_forgets(self):
+        with mock.patch.object(self.es_client.es.indices, 'exists', return_value=True) as exists, \
+                mock.patch.object(self.es_client.es.indices, 'delete'):
+            self.es_client.create_index('cwl-2018-06-08')
+            self.es_client.delete_index('cwl-2018-06-08')
+            self.es_client.create_index('cwl-2018-06-08')
+            self.assertEqual(exists.call_count, 2)
+
+    def test_put_index_template_once(self):
+        with mock.patch.object(self.es_client.es.indices, 'put_template') as put_template:
+            self.es_client.put_index_template()
+            self.es_client.put_index_template()
+        put_template.assert_called_once()
+        self.assertEqual(put_template.call_args[1]['body']['template'], 'cwl-*')
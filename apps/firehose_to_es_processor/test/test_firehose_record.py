@@ -1,5 +1,5 @@
 import unittest
-from lib.firehose_record import FirehoseRecord
+from lib.firehose_record import FirehoseRecord, format_timestamp
 
 
 class TestFirehoseRecord(unittest.TestCase):
@@ -23,3 +23,9 @@ class TestFirehoseRecord(unittest.TestCase):
         self.assertEqual(log_event_one["@id"], 123456)
         self.assertEqual(log_event_one["hi"], '"hello"')
         self.assertIsNone(log_event_one.get('invalid?'))
+        self.assertEqual(log_event_one["@timestamp"], "2018-03-02T05:58:17.000Z")
+
+    def test_format_timestamp(self):
+        self.assertEqual(format_timestamp(1519970297016), "2018-03-02T05:58:17.016Z")
+        self.assertEqual(format_timestamp(1519970297999), "2018-03-02T05:58:17.999Z")
+        self.assertEqual(format_timestamp(1519970298000), "2018-03-02T05:58:18.000Z")
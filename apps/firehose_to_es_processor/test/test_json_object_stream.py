@@ -6,7 +6,7 @@ import unittest
 pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
 sys.path.insert(0, pkg_root)  # noqa
 
-from lib.json_object_stream import JsonObjectStream
+from lib.json_object_stream import JsonObjectStream, JsonBytesObjectStream
 
 
 class TestJsonObjectStream(unittest.TestCase):
@@ -29,6 +29,55 @@ class TestJsonObjectStream(unittest.TestCase):
         with self.assertRaises(StopIteration):
             json_stream.__next__()
 
+    def test_objects_straddling_chunks(self):
+        data = '{"a": {"b": [1, 2, "}{"]}}\n{"c": "\\"}"}  {"d": null}'
+        expected = [{'a': {'b': [1, 2, '}{']}}, {'c': '"}'}, {'d': None}]
+        for chunk_size in [1, 2, 3, 7, 1024]:
+            with self.subTest(chunk_size=chunk_size):
+                json_stream = JsonObjectStream(io.StringIO(data), chunk_size=chunk_size)
+                self.assertEqual(list(json_stream), expected)
+
+    def test_truncated_tail(self):
+        json_stream = JsonObjectStream(io.StringIO('{"a":1}{"b": "trunc'), chunk_size=4)
+        self.assertEqual(list(json_stream), [{'a': 1}])
+
+    def test_invalid_object(self):
+        json_stream = JsonObjectStream(io.StringIO('{"a":1}{"b"}{"c":2}'), chunk_size=4)
+        self.assertDictEqual(json_stream.__next__(), {'a': 1})
+        with self.assertRaises(ValueError):
+            json_stream.__next__()
+
+
+class TestJsonBytesObjectStream(unittest.TestCase):
+
+    @staticmethod
+    def _chunks(data, chunk_size):
+        return [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+    def test_next(self):
+        json_stream = JsonBytesObjectStream([b'{"a":1}{"b": "\\"}\\\\"}'])
+        self.assertDictEqual(json_stream.__next__(), {'a': 1})
+        self.assertDictEqual(json_stream.__next__(), {'b': '\"}\\'})
+        with self.assertRaises(StopIteration):
+            json_stream.__next__()
+
+    def test_objects_straddling_chunks(self):
+        data = '{"a": {"b": [1, 2, "}{"]}}\n{"c": "\\"}{"}  {"d": "\u00e9}{"}'.encode('utf-8')
+        expected = [{'a': {'b': [1, 2, '}{']}}, {'c': '"}{'}, {'d': '\u00e9}{'}]
+        for chunk_size in [1, 2, 3, 7, 1024]:
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(list(JsonBytesObjectStream(self._chunks(data, chunk_size))), expected)
+
+    def test_truncated_tail(self):
+        json_stream = JsonBytesObjectStream(self._chunks(b'{"a":1}{"b": "trunc', 4))
+        self.assertEqual(list(json_stream), [{'a': 1}])
+
+    def test_invalid_object(self):
+        json_stream = JsonBytesObjectStream(self._chunks(b'{"a":1}{"b"}{"c":2}', 4))
+        self.assertDictEqual(json_stream.__next__(), {'a': 1})
+        with self.assertRaises(ValueError):
+            json_stream.__next__()
+
 
 if __name__ == '__main__':
     unittest.main()
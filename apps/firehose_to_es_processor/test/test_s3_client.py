@@ -1,3 +1,5 @@
+import gzip
+import io
 import json
 import os
 import sys
@@ -43,6 +45,32 @@ class TestS3Client(unittest.TestCase):
         output_records = list(record_stream)
         self.assertEqual(len(output_records), 3)
 
+    def test_stream_firehose_file(self):
+        file = self.s3_client.retrieve_file(self.s3_object_key)['Body']
+        record_stream = firehose_records.from_docs(self.s3_client.stream_firehose_file(file))
+        self.assertEqual(len(list(record_stream)), 3)
+
+
+class TestGunzip(unittest.TestCase):
+
+    def test_stream_matches_text_parsing(self):
+        with open("test/data/file.txt.gz", 'rb') as fh:
+            compressed = fh.read()
+        expected = list(S3Client.unzip_and_parse_firehose_file(io.BytesIO(compressed)))
+        for read_size, chunk_size in [(1, 1), (16, 64), (S3Client.READ_SIZE, S3Client.DECOMPRESSED_CHUNK_SIZE)]:
+            with self.subTest(read_size=read_size, chunk_size=chunk_size):
+                docs = list(S3Client.stream_firehose_file(io.BytesIO(compressed), read_size, chunk_size))
+                self.assertEqual(docs, expected)
+
+    def test_gunzip_concatenated_members(self):
+        compressed = gzip.compress(b'{"a": 1}') + gzip.compress(b'{"b": 2}')
+        self.assertEqual(b''.join(S3Client.gunzip_chunks(io.BytesIO(compressed), 3, 2)), b'{"a": 1}{"b": 2}')
+
+    def test_gunzip_truncated(self):
+        compressed = gzip.compress(b'{"a": 1}' * 100)
+        with self.assertRaises(EOFError):
+            list(S3Client.gunzip_chunks(io.BytesIO(compressed[:-10])))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,118 @@
+import io
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+from botocore.exceptions import ClientError
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+from lib import firehose_records
+from lib.s3_client import S3Client
+from lib.s3_prefetch_reader import S3PrefetchReader
+
+
+class FakeS3Client:
+    """Stands in for a boto3 S3 client, serving ranged GETs of in-memory objects."""
+
+    def __init__(self, objects, delay=0.0):
+        self.objects = objects
+        self.delay = delay
+        self.ranges = []
+        self.max_active = 0
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None):
+        if Key not in self.objects:
+            raise ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+        body = self.objects[Key]
+        etag = '"{}"'.format(hash(body))
+        if IfMatch is not None and IfMatch != etag:
+            raise ClientError({'Error': {'Code': 'PreconditionFailed'}}, 'GetObject')
+        with self._lock:
+            self.ranges.append(Range)
+            self._active += 1
+            self.max_active = max(self.max_active, self._active)
+        try:
+            time.sleep(self.delay)
+            start, end = (int(i) for i in Range[len('bytes='):].split('-'))
+            if start >= len(body):
+                raise ClientError({'Error': {'Code': 'InvalidRange'}}, 'GetObject')
+            part = body[start:end + 1]
+            return {
+                'Body': io.BytesIO(part),
+                'ContentLength': len(part),
+                'ContentRange': f"bytes {start}-{start + len(part) - 1}/{len(body)}",
+                'ETag': etag,
+            }
+        finally:
+            with self._lock:
+                self._active -= 1
+
+
+class TestS3PrefetchReader(unittest.TestCase):
+
+    body = bytes(range(256)) * 1000
+
+    def test_read(self):
+        for part_size in [1000, 4096, len(self.body) - 1, len(self.body), len(self.body) * 2]:
+            for read_size in [1, 100, 5000, -1]:
+                with self.subTest(part_size=part_size, read_size=read_size):
+                    client = FakeS3Client({'key': self.body})
+                    with S3PrefetchReader(client, 'bucket', 'key', part_size=part_size, depth=3) as reader:
+                        if read_size == -1:
+                            data = reader.read()
+                        else:
+                            chunks = iter(lambda: reader.read(read_size), b'')
+                            data = b''.join(chunks)
+                        self.assertEqual(data, self.body)
+                        self.assertEqual(reader.read(10), b'')
+
+    def test_ranges(self):
+        client = FakeS3Client({'key': b'x' * 2500})
+        with S3PrefetchReader(client, 'bucket', 'key', part_size=1000, depth=2) as reader:
+            self.assertEqual(len(reader.read()), 2500)
+        self.assertEqual(client.ranges, ["bytes=0-999", "bytes=1000-1999", "bytes=2000-2499"])
+
+    def test_depth_bounds_requests_in_flight(self):
+        client = FakeS3Client({'key': self.body}, delay=0.02)
+        with S3PrefetchReader(client, 'bucket', 'key', part_size=10000, depth=3) as reader:
+            self.assertEqual(reader.read(), self.body)
+        self.assertEqual(client.max_active, 3)
+
+    def test_readinto(self):
+        client = FakeS3Client({'key': self.body})
+        with io.BufferedReader(S3PrefetchReader(client, 'bucket', 'key', part_size=777, depth=2)) as reader:
+            self.assertEqual(reader.read(), self.body)
+
+    def test_empty_object(self):
+        client = FakeS3Client({'key': b''})
+        with S3PrefetchReader(client, 'bucket', 'key') as reader:
+            self.assertEqual(reader.read(), b'')
+
+    def test_missing_object(self):
+        client = FakeS3Client({})
+        with S3PrefetchReader(client, 'bucket', 'key') as reader, mock.patch('time.sleep') as sleep:
+            with self.assertRaises(ClientError) as context:
+                reader.read()
+        sleep.assert_not_called()
+        self.assertEqual(context.exception.response['Error']['Code'], 'NoSuchKey')
+
+    def test_firehose_file(self):
+        with open(os.path.join(pkg_root, "test/data/file.txt.gz"), 'rb') as fh:
+            compressed = fh.read()
+        expected = list(firehose_records.from_docs(S3Client.stream_firehose_file(io.BytesIO(compressed))))
+        client = FakeS3Client({'key': compressed})
+        with S3PrefetchReader(client, 'bucket', 'key', part_size=100, depth=4) as reader:
+            records = list(firehose_records.from_docs(S3Client.stream_firehose_file(reader, read_size=3000)))
+        self.assertEqual(records, expected)
+        self.assertGreater(len(client.ranges), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import json
+import os
+import sys
+import unittest
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+from lib import serializer
+
+
+class TestSerializer(unittest.TestCase):
+
+    values = [
+        None, True, False, 0, -1, 2 ** 63 - 1, 1.5, 1e-07, 3.141592653589793,
+        "", "hello", "quote \" backslash \\ slash / tab \t newline \n", "café ☃ \U0001F600",
+        [], [1, "two", None], {}, {"a": {"b": [1, 2, {"c": "d"}]}, "é": "é"},
+    ]
+
+    def test_loads_parity(self):
+        for value in self.values:
+            with self.subTest(value=value):
+                text = json.dumps(value)
+                self.assertEqual(serializer._stdlib_loads(text), value)
+                self.assertEqual(serializer.loads(text), value)
+                self.assertEqual(serializer.loads(text.encode('utf-8')), value)
+
+    def test_loads_accepts_what_the_standard_library_accepts(self):
+        self.assertEqual(serializer.loads('{"big": 18446744073709551616}'), {"big": 2 ** 64})
+        self.assertEqual(serializer.loads('[Infinity]'), [float('inf')])
+        with self.assertRaises(ValueError):
+            serializer.loads('{"a"}')
+
+    @unittest.skipIf(serializer.orjson is None, "orjson is not installed")
+    def test_dumps_parity(self):
+        for value in self.values + [{"big": 2 ** 64}]:
+            with self.subTest(value=value):
+                if value == 1e-07:
+                    # the backends format exponents differently ('1e-7' vs '1e-07')
+                    self.assertEqual(float(serializer._orjson_dumps(value)), value)
+                else:
+                    self.assertEqual(serializer._orjson_dumps(value), serializer._stdlib_dumps(value))
+                self.assertEqual(serializer._orjson_loads(serializer._orjson_dumps(value)), value)
+
+    def test_dumps_default(self):
+        class Custom:
+            pass
+
+        self.assertEqual(serializer.dumps({"a": Custom()}, default=lambda o: "custom"), '{"a":"custom"}')
+        with self.assertRaises(TypeError):
+            serializer.dumps({"a": Custom()})
+
+    def test_dumps_compatible(self):
+        for value in self.values + [float('nan'), 2 ** 64]:
+            with self.subTest(value=value):
+                self.assertEqual(serializer.dumps_compatible(value), json.dumps(value))
+
+
+if __name__ == '__main__':
+    unittest.main()
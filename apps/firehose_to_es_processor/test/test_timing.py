@@ -0,0 +1,65 @@
+import io
+import os
+import sys
+import time
+import unittest
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+from lib.timing import StageTimer, percentile
+
+
+def slow(iterable, seconds):
+    for item in iterable:
+        time.sleep(seconds)
+        yield item
+
+
+class TestStageTimer(unittest.TestCase):
+
+    def test_timed(self):
+        timer = StageTimer()
+        for _ in range(2):
+            with timer.timed('delete'):
+                time.sleep(0.01)
+        self.assertGreaterEqual(timer.seconds['delete'], 0.02)
+
+    def test_timed_exception(self):
+        timer = StageTimer()
+        with self.assertRaises(ValueError):
+            with timer.timed('delete'):
+                raise ValueError()
+        self.assertIn('delete', timer.seconds)
+
+    def test_nested_stages(self):
+        timer = StageTimer()
+        reader = timer.timed_reader('fetch', io.BytesIO(b'x' * 100))
+        chunks = timer.timed_iter('gunzip', slow(iter(lambda: reader.read(10), b''), 0.01), size=len)
+        items = timer.timed_iter('transform', slow(chunks, 0.02))
+        self.assertEqual(len(list(items)), 10)
+        self.assertEqual(timer.sizes['fetch'], 100)
+        self.assertEqual(timer.sizes['gunzip'], 100)
+        self.assertEqual(timer.counts['transform'], 10)
+        exclusive = timer.exclusive(['fetch', 'gunzip', 'split', 'transform'])
+        self.assertEqual(list(exclusive), ['fetch', 'gunzip', 'transform'])
+        self.assertLess(exclusive['fetch'], 0.01)
+        self.assertAlmostEqual(exclusive['gunzip'], 0.1, delta=0.05)
+        self.assertAlmostEqual(exclusive['transform'], 0.2, delta=0.05)
+        self.assertAlmostEqual(sum(exclusive.values()), timer.seconds['transform'])
+
+
+class TestPercentile(unittest.TestCase):
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertEqual(percentile(values, 0), 1)
+        self.assertEqual(percentile([0.3, 0.1, 0.2], 50), 0.2)
+        self.assertIsNone(percentile([], 50))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import json
+import os
+import sys
+import unittest
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+from lib import firehose_records
+from lib.bulk_request import BulkRequest
+from lib.json_object_stream import JsonBytesObjectStream
+from lib.transform_pool import TransformError, TransformPool, split_records
+
+
+def firehose_doc(i, message="message"):
+    return {
+        "messageType": "DATA_MESSAGE",
+        "owner": "123456789012",
+        "logGroup": "/test/log_group",
+        "logStream": "log_stream",
+        "logEvents": [
+            {"id": str(i * 10 + j), "timestamp": 1519970297000 + j, "message": f"{message} {i} {j}"} for j in range(3)
+        ]
+    }
+
+
+class CountingNotifier:
+
+    def __init__(self):
+        self._report = {}
+
+    def notify_on_stream(self, log_event_stream):
+        for log_event in log_event_stream:
+            self._report[log_event['@log_group']] = self._report.get(log_event['@log_group'], 0) + 1
+            yield log_event
+
+
+class TestSplitRecords(unittest.TestCase):
+
+    def test_split_on_record_boundaries(self):
+        docs = [firehose_doc(i) for i in range(20)]
+        data = ''.join(json.dumps(doc) for doc in docs).encode('utf-8')
+        for chunk_size in [1, 100, 1000, len(data)]:
+            for read_size in [7, 500, len(data)]:
+                with self.subTest(chunk_size=chunk_size, read_size=read_size):
+                    chunks = [data[i:i + read_size] for i in range(0, len(data), read_size)]
+                    runs = list(split_records(chunks, chunk_size))
+                    self.assertEqual(b''.join(runs), data)
+                    decoded = [doc for run in runs for doc in JsonBytesObjectStream([run])]
+                    self.assertEqual(decoded, docs)
+                    if chunk_size == 1:
+                        self.assertEqual(len(runs), 20)
+
+    def test_brace_seam_in_message(self):
+        docs = [firehose_doc(i, message='}{"a": 1}{ }{') for i in range(5)]
+        data = ''.join(json.dumps(doc) for doc in docs).encode('utf-8')
+        runs = list(split_records([data], 1))
+        self.assertEqual(len(runs), 5)
+        self.assertEqual([json.loads(run) for run in runs], docs)
+
+
+class TestTransformPool(unittest.TestCase):
+
+    docs = [firehose_doc(i) for i in range(50)]
+    data = ''.join(json.dumps(doc) for doc in docs).encode('utf-8')
+
+    def expected_lines(self, **kwargs):
+        return list(BulkRequest.to_lines(firehose_records.from_docs(self.docs), **kwargs))
+
+    def test_transform(self):
+        for processes in [1, 3]:
+            with self.subTest(processes=processes):
+                with TransformPool(processes, 'hash', 'create', "cwl", chunk_size=500) as pool:
+                    lines = list(pool.transform([self.data[:1000], self.data[1000:]]))
+                self.assertEqual(lines, self.expected_lines(document_id='hash', op_type='create', index_prefix="cwl"))
+                self.assertEqual(pool.notifiers, [None] * processes)
+
+    def test_notifier_reports(self):
+        with TransformPool(2, notifier_factory=CountingNotifier, chunk_size=500) as pool:
+            lines = list(pool.transform([self.data]))
+        self.assertEqual(len(lines), 150)
+        self.assertEqual(sum(notifier._report["/test/log_group"] for notifier in pool.notifiers), 150)
+
+    def test_worker_error(self):
+        with TransformPool(2, chunk_size=500) as pool:
+            with self.assertRaises(TransformError) as context:
+                list(pool.transform([self.data + b'{"not": "a record"}']))
+        self.assertIn("KeyError", str(context.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
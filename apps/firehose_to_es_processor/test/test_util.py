@@ -55,3 +55,13 @@ class TestUtil(unittest.TestCase):
         test_input = '{"test": {"hi": "hello"}}'
         test_output = extract_json(test_input)
         self.assertEqual(test_output, {'test': {'hi': 'hello'}})
+
+        # Should extract json whose string values contain braces
+        test_input = 'GET {"path": "/v1/{uuid}", "status": 200} done'
+        test_output = extract_json(test_input)
+        self.assertEqual(test_output, {'path': '/v1/{uuid}', 'status': 200})
+
+        # Should return empty dict for truncated json
+        test_input = '[WARNING] {"error": "truncated", "detail": "payload was cut sho'
+        test_output = extract_json(test_input)
+        self.assertEqual(test_output, {})
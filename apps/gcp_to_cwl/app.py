@@ -2,23 +2,29 @@ import logging
 import os
 import sys
 import json
-import typing
 
-from datetime import timedelta
-from datetime import datetime
 from contextlib import contextmanager
-from dateutil.parser import parse as dt_parse
 
 pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), './lib'))  # noqa
 sys.path.insert(0, pkg_root)  # noqa
 
-from cloudwatchlogs import CloudWatchLogs
+from cloudwatchlogs import CloudWatchLogs, SequenceTokenCache
+from log_entries import group_entries_into_requests, format_log_entry, get_log_message, get_log_group  # noqa: F401
+from pipeline import BatchAcker, pull_ahead
 from pubsub import SynchronousPullClient
 from secrets import config
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+PIPELINED = config.get('pipelined', True)
+MAX_CONCURRENT_PUTS = config.get('max_concurrent_puts', CloudWatchLogs.MAX_CONCURRENT_PUTS)
+SEQUENCE_TOKEN_CACHE_FILE = config.get('sequence_token_cache_file')
+
+# kept across warm invocations, so each log stream's token is only looked up once per container
+sequence_token_cache = SequenceTokenCache.load(SEQUENCE_TOKEN_CACHE_FILE) if SEQUENCE_TOKEN_CACHE_FILE \
+    else SequenceTokenCache()
+
 
 def handler(input, context):
     batch_size = 1000
@@ -28,22 +34,42 @@ def handler(input, context):
         config['gcp_exporter_google_application_credentials']['project_id'],
         log_subscription)
     cloudwatchlogs = CloudWatchLogs()
-    sequence_token_cache = {}
+    try:
+        if PIPELINED:
+            total = process_pipelined(batch_client, cloudwatchlogs, batch_size, sequence_token_cache)
+        else:
+            total = 0
+            for unformatted_log_entries in batch_client.to_generator(batch_size):
+                total += len(unformatted_log_entries)
+                put_log_entries(cloudwatchlogs, unformatted_log_entries, sequence_token_cache)
+    finally:
+        if SEQUENCE_TOKEN_CACHE_FILE:
+            sequence_token_cache.save(SEQUENCE_TOKEN_CACHE_FILE)
+    logger.info('Processed {} entries in total.'.format(total))
+
 
+def process_pipelined(batch_client, cloudwatchlogs, batch_size, sequence_token_cache) -> int:
+    """Puts the log entries of each pulled batch while the next batch is being pulled, acking each batch in the
+    background once all of its entries are put."""
     total = 0
-    for unformatted_log_entries in batch_client.to_generator(batch_size):
-        num_log_entries = len(unformatted_log_entries)
-        total += num_log_entries
-        logger.info(json.dumps({'operation': 'batch_pull', 'num_unformatted_log_entries': num_log_entries}))
-        requests, log_group_counts = group_entries_into_requests(unformatted_log_entries)
-        logger.info(json.dumps({**{'operation': 'format_log_entries'}, **{'counts': log_group_counts}}))
-        for request in requests:
-            try:
-                cloudwatchlogs.put_log_events(request, sequence_token_cache)
-            except Exception as e:
-                logger.info("ERROR on input: " + str(unformatted_log_entries))
-                raise e
-    logger.info('Processed {} entries in total.'.format(total))
+    with BatchAcker(batch_client.ack) as acker:
+        for unformatted_log_entries, ack_ids in pull_ahead(batch_client, batch_size):
+            total += len(unformatted_log_entries)
+            put_log_entries(cloudwatchlogs, unformatted_log_entries, sequence_token_cache)
+            acker.ack(ack_ids)
+    return total
+
+
+def put_log_entries(cloudwatchlogs, unformatted_log_entries, sequence_token_cache):
+    num_log_entries = len(unformatted_log_entries)
+    logger.info(json.dumps({'operation': 'batch_pull', 'num_unformatted_log_entries': num_log_entries}))
+    requests, log_group_counts = group_entries_into_requests(unformatted_log_entries)
+    logger.info(json.dumps({**{'operation': 'format_log_entries'}, **{'counts': log_group_counts}}))
+    try:
+        cloudwatchlogs.put_log_events_concurrently(requests, sequence_token_cache, MAX_CONCURRENT_PUTS)
+    except Exception as e:
+        logger.info("ERROR on input: " + str(unformatted_log_entries))
+        raise e
 
 
 @contextmanager
@@ -53,64 +79,3 @@ def file(filename, mode):
         yield f
     finally:
         f.close()
-
-
-def group_entries_into_requests(unformatted_log_entries) -> (typing.List[dict], dict):
-    twenty_three_hours_ago = (
-        datetime.utcnow() - timedelta(hours=23)).timestamp() * 1000
-    requests = {}
-    log_group_counts = {}
-
-    for unformatted_entry in unformatted_log_entries:
-        log_entry = format_log_entry(unformatted_entry)
-        log_group = get_log_group(unformatted_entry)
-
-        if log_group not in requests:
-            log_group_counts[log_group] = {'filtered': 0, 'unfiltered': 0}
-            requests[log_group] = {
-                'logGroupName': log_group,
-                'logStreamName': 'default',
-                'logEvents': []
-            }
-
-        log_group_counts[log_group]['unfiltered'] += 1
-
-        if log_entry['timestamp'] > twenty_three_hours_ago and log_entry['message'] is not None:
-            log_group_counts[log_group]['filtered'] += 1
-            requests[log_group]['logEvents'].append(log_entry)
-
-    for log_group, request in requests.items():
-        request['logEvents'].sort(key=lambda r: r['timestamp'])
-
-    return list(filter(lambda r: len(r['logEvents']) > 0, requests.values())), log_group_counts
-
-
-def format_log_entry(unformatted_log_entry) -> dict:
-    return {
-        'timestamp': int(dt_parse(unformatted_log_entry['timestamp']).timestamp() * 1000),
-        'message': get_log_message(unformatted_log_entry)
-    }
-
-
-def get_log_message(unformatted_log_entry):
-    if 'textPayload' in unformatted_log_entry:
-        return unformatted_log_entry['textPayload']
-    elif 'jsonPayload' in unformatted_log_entry:
-        return json.dumps(unformatted_log_entry['jsonPayload'])
-    elif 'protoPayload' in unformatted_log_entry:
-        return str(unformatted_log_entry['protoPayload'])
-
-
-def get_log_group(unformatted_log_entry) -> str:
-    resource_name_map = {
-        'gcs_bucket': 'bucket_name',
-        'cloud_function': 'function_name',
-        'gae_app': 'module_id',
-        'container': 'container_name',
-    }
-    project_id = unformatted_log_entry['resource']['labels']['project_id']
-    resource_type = unformatted_log_entry['resource']['type']
-    resource_name_key = resource_name_map.get(resource_type)
-    resource_name_suffix = f"/{unformatted_log_entry['resource']['labels'][resource_name_key]}" \
-        if resource_name_key else ''
-    return f"/gcp/{project_id}/{resource_type}{resource_name_suffix}"
@@ -0,0 +1,52 @@
+import os
+import random
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../lib'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+RESOURCES = [
+    {'type': 'cloud_function', 'labels': {'project_id': 'cool-project', 'function_name': 'Fn1', 'region': 'us-central1'}},
+    {'type': 'cloud_function', 'labels': {'project_id': 'cool-project', 'function_name': 'Fn2', 'region': 'us-central1'}},
+    {'type': 'gcs_bucket', 'labels': {'project_id': 'cool-project', 'bucket_name': 'bucket', 'location': 'us'}},
+    {'type': 'gae_app', 'labels': {'project_id': 'cool-project', 'module_id': 'default', 'version_id': '1'}},
+    {'type': 'container', 'labels': {'project_id': 'cool-project', 'container_name': 'web', 'zone': 'us-east1-b'}},
+    {'type': 'gce_instance', 'labels': {'project_id': 'cool-project', 'instance_id': '1234', 'zone': 'us-east1-b'}},
+]
+
+
+def log_entries(num_entries, seed=0):
+    """LogEntries shaped like the ones the Stackdriver export sends to Pub/Sub, from the last hour."""
+    rand = random.Random(seed)
+    start = datetime.utcnow() - timedelta(hours=1)
+    entries = []
+    for i in range(num_entries):
+        timestamp = start + timedelta(microseconds=rand.randrange(3600 * 10 ** 6))
+        entry = {
+            'insertId': f"{i:016x}",
+            'logName': 'projects/cool-project/logs/cloudfunctions.googleapis.com%2Fcloud-functions',
+            'receiveTimestamp': timestamp.strftime('%Y-%m-%dT%H:%M:%S.%f') + '123Z',
+            'resource': rand.choice(RESOURCES),
+            'severity': rand.choice(['DEBUG', 'INFO', 'ERROR']),
+            'timestamp': timestamp.strftime('%Y-%m-%dT%H:%M:%S.%f') + f"{rand.randrange(1000):03d}Z",
+        }
+        if rand.random() < 0.7:
+            entry['textPayload'] = f"Function execution took {rand.randrange(1000)} ms, finished with status: 'ok'"
+        else:
+            entry['jsonPayload'] = {'message': 'request handled', 'status': 200, 'latency': rand.random()}
+        entries.append(entry)
+    return entries
+
+
+@contextmanager
+def timed(label, num_items=None, unit='items'):
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    rates = [f"{elapsed:.3f}s"]
+    if num_items is not None:
+        rates.append(f"{num_items / elapsed:,.0f} {unit}/s")
+    print(f"{label:<40} {'  '.join(rates)}")
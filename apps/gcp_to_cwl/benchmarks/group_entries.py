@@ -0,0 +1,55 @@
+"""
+Entries/sec of group_entries_into_requests against its previous timestamp parsing and log group derivation, which
+parsed every timestamp with dateutil and rebuilt the resource name map for every entry.
+
+    python -m benchmarks.group_entries [num_entries]
+"""
+import sys
+from unittest import mock
+
+from dateutil.parser import parse as dt_parse
+
+from benchmarks import log_entries, timed
+import log_entries as module
+
+
+def previous_timestamp_millis(timestamp):
+    return int(dt_parse(timestamp).timestamp() * 1000)
+
+
+def previous_get_log_group(unformatted_log_entry):
+    resource_name_map = {
+        'gcs_bucket': 'bucket_name',
+        'cloud_function': 'function_name',
+        'gae_app': 'module_id',
+        'container': 'container_name',
+    }
+    project_id = unformatted_log_entry['resource']['labels']['project_id']
+    resource_type = unformatted_log_entry['resource']['type']
+    resource_name_key = resource_name_map.get(resource_type)
+    resource_name_suffix = f"/{unformatted_log_entry['resource']['labels'][resource_name_key]}" \
+        if resource_name_key else ''
+    return f"/gcp/{project_id}/{resource_type}{resource_name_suffix}"
+
+
+def main(num_entries):
+    entries = log_entries(num_entries)
+    with mock.patch.object(module, 'timestamp_millis', previous_timestamp_millis), \
+            mock.patch.object(module, 'get_log_group', previous_get_log_group):
+        with timed('dateutil', num_entries, 'entries'):
+            previous, _ = module.group_entries_into_requests(entries)
+    with timed('timestamp_millis, cached log groups', num_entries, 'entries'):
+        current, _ = module.group_entries_into_requests(entries)
+    assert current == previous
+
+    timestamps = [entry['timestamp'] for entry in entries]
+    with timed('  dateutil parse only', num_entries, 'timestamps'):
+        for timestamp in timestamps:
+            previous_timestamp_millis(timestamp)
+    with timed('  timestamp_millis only', num_entries, 'timestamps'):
+        for timestamp in timestamps:
+            module.timestamp_millis(timestamp)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
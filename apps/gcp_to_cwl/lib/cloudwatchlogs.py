@@ -1,6 +1,46 @@
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
 import boto3
 from botocore.exceptions import ClientError
 
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+# PutLogEvents limits, see https://docs.aws.amazon.com/AmazonCloudWatchLogs/latest/APIReference/API_PutLogEvents.html
+EVENT_OVERHEAD = 26
+MAX_BATCH_BYTES = 1048576
+MAX_BATCH_EVENTS = 10000
+MAX_BATCH_SPAN = 24 * 60 * 60 * 1000
+
+
+def split_log_events(log_events, max_bytes=MAX_BATCH_BYTES, max_events=MAX_BATCH_EVENTS, max_span=MAX_BATCH_SPAN):
+    """Splits log events sorted by timestamp into the fewest runs that PutLogEvents accepts in one request.
+
+    A run holds at most max_events events, takes at most max_bytes counting each event as its UTF-8 encoded
+    message plus EVENT_OVERHEAD bytes, and spans at most max_span milliseconds. An event too large for a request
+    of its own is still given one, for the service to reject.
+    """
+    batch = []
+    batch_bytes = 0
+    for event in log_events:
+        event_bytes = len(event['message'].encode('utf-8')) + EVENT_OVERHEAD
+        if batch and (batch_bytes + event_bytes > max_bytes or
+                      len(batch) == max_events or
+                      event['timestamp'] - batch[0]['timestamp'] > max_span):
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(event)
+        batch_bytes += event_bytes
+    if batch:
+        yield batch
+
 
 class LogStatus:
 
@@ -12,25 +52,112 @@ class LogStatus:
         self.upload_token = None
 
 
+class SequenceTokenCache(dict):
+    """The next sequence token of each log stream, by `cache_key`, and the log groups known to exist.
+
+    A stream with a token is known to exist too. Kept across invocations, and saved to a file to survive a restart
+    of the runtime, it spares each stream the failed put and the lookups needed to find its token or create it.
+
+    Each stream also has a lock, held while putting to it, so that puts to the same stream from different threads
+    take turns and always see the token left by the previous one.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.log_groups = set()
+        self._stream_locks = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        """The cache saved to path, or an empty one if there is none."""
+        cache = cls()
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+            cache.update(snapshot['sequence_tokens'])
+            cache.log_groups.update(snapshot['log_groups'])
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Ignoring unreadable sequence token cache {path}")
+        return cache
+
+    def save(self, path):
+        snapshot = {'sequence_tokens': dict(self), 'log_groups': sorted(self.log_groups)}
+        temporary_path = f"{path}.{os.getpid()}"
+        with open(temporary_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(temporary_path, path)
+
+    def stream_lock(self, key):
+        with self._lock:
+            lock = self._stream_locks.get(key)
+            if lock is None:
+                lock = self._stream_locks[key] = threading.Lock()
+            return lock
+
+
+def cache_key(request):
+    return f"{request['logGroupName']}.{request['logStreamName']}"
+
+
 class CloudWatchLogs:
 
-    def __init__(self, client=boto3.client('logs')):
-        self.client = client
+    MAX_CONCURRENT_PUTS = 8
+
+    def __init__(self, client=None):
+        # created here rather than as the default argument, so importing this module needs no AWS region
+        self.client = boto3.client('logs') if client is None else client
+
+    def put_log_events_concurrently(self, requests, sequence_token_cache, max_concurrent_puts=MAX_CONCURRENT_PUTS):
+        """Puts the requests to different log streams concurrently, up to max_concurrent_puts at a time, and those
+        to the same log stream one after the other in the order given.
+
+        sequence_token_cache must be a SequenceTokenCache. If a put fails, the puts to the other streams are
+        completed before the error is raised.
+        """
+        requests_by_stream = OrderedDict()
+        for request in requests:
+            requests_by_stream.setdefault(cache_key(request), []).append(request)
+
+        def put_stream(key, stream_requests):
+            with sequence_token_cache.stream_lock(key):
+                return [self.put_log_events(request, sequence_token_cache) for request in stream_requests]
+
+        if len(requests_by_stream) <= 1 or max_concurrent_puts <= 1:
+            responses = [put_stream(key, stream_requests) for key, stream_requests in requests_by_stream.items()]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_concurrent_puts, len(requests_by_stream))) as executor:
+                futures = [
+                    executor.submit(put_stream, key, stream_requests)
+                    for key, stream_requests in requests_by_stream.items()
+                ]
+            responses = [future.result() for future in futures]
+        return [response for stream_responses in responses for response in stream_responses]
 
     def put_log_events(self, request, sequence_token_cache):
+        known_log_groups = getattr(sequence_token_cache, 'log_groups', set())
         try:
-            return self._put_log_events(request, sequence_token_cache)
+            response = self._put_log_events(request, sequence_token_cache)
         except ClientError as e:
             if e.response.get("Error", {}).get("Code") != 'ResourceNotFoundException':
                 raise e
-            self.prepare(request['logGroupName'], request['logStreamName'])
-            return self._put_log_events(request, sequence_token_cache)
+            log_group_exists = request['logGroupName'] in known_log_groups
+            upload_token = self.prepare(request['logGroupName'], request['logStreamName'], log_group_exists)
+            if upload_token:
+                sequence_token_cache[cache_key(request)] = upload_token
+            else:
+                sequence_token_cache.pop(cache_key(request), None)
+            response = self._put_log_events(request, sequence_token_cache)
+        known_log_groups.add(request['logGroupName'])
+        return response
 
     def _put_log_events(self, request, sequence_token_cache):
-        cache_key = f"{request['logGroupName']}.{request['logStreamName']}"
+        key = cache_key(request)
         try:
-            if cache_key in sequence_token_cache:
-                sequence_token = sequence_token_cache[cache_key]
+            if key in sequence_token_cache:
+                sequence_token = sequence_token_cache[key]
                 response = self.client.put_log_events(
                     logGroupName=request['logGroupName'],
                     logStreamName=request['logStreamName'],
@@ -51,15 +178,28 @@ class CloudWatchLogs:
             correct_sequence_token = str(e).split(' ')[-1]
             print(f"{request['logGroupName']}: handling {error_code}, new token is {correct_sequence_token}.")
             if correct_sequence_token != 'null':
-                sequence_token_cache[cache_key] = correct_sequence_token
+                sequence_token_cache[key] = correct_sequence_token
             else:
-                sequence_token_cache.pop(cache_key, None)
+                sequence_token_cache.pop(key, None)
             response = self._put_log_events(request, sequence_token_cache)
 
-        sequence_token_cache[cache_key] = response['nextSequenceToken']
+        sequence_token_cache[key] = response['nextSequenceToken']
         return response
 
-    def prepare(self, log_group, log_stream):
+    def prepare(self, log_group, log_stream, log_group_exists=False):
+        """Creates the log group and stream if they do not exist, returning the stream's upload sequence token.
+
+        Given that the log group exists, only the stream is created, unless the group turns out to be gone.
+        """
+        if log_group_exists:
+            try:
+                status = LogStatus(log_group=log_group, log_stream=log_stream)
+                status.log_group_exists = True
+                return self._create_log_stream_if_needed(status).upload_token
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") != 'ResourceNotFoundException':
+                    raise e
+                print(f"{log_group}: Log group no longer exists!")
         status = LogStatus(log_group=log_group, log_stream=log_stream)
         status = self._get_upload_token_if_possible(status)
         status = self._create_log_group_if_needed(status)
@@ -102,13 +242,15 @@ class CloudWatchLogs:
                 logStreamNamePrefix=status.log_stream
             )
             for page in pages:
-                for stream in page:
+                for stream in page['logStreams']:
                     if stream['logStreamName'] == status.log_stream:
                         status.log_group_exists = True
                         status.log_stream_exists = True
-                        status.upload_token = stream['uploadSequenceToken']
+                        status.upload_token = stream.get('uploadSequenceToken')
                         return status
-            print(f"{status.log_group}: Log group/stream exists!")
+            print(f"{status.log_group}: Log group exists, log stream does not!")
+            status.log_group_exists = True
+            status.log_stream_exists = False
             return status
         except ClientError as e:
             if e.response.get("Error", {}).get("Code") != 'ResourceNotFoundException':
@@ -0,0 +1,115 @@
+import json
+import re
+import typing
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+from dateutil.parser import parse as dt_parse
+
+from cloudwatchlogs import split_log_events
+
+RESOURCE_NAME_LABELS = {
+    'gcs_bucket': 'bucket_name',
+    'cloud_function': 'function_name',
+    'gae_app': 'module_id',
+    'container': 'container_name',
+}
+
+# the RFC3339 timestamps of LogEntries, with up to nanosecond precision, e.g. 2017-12-24T06:27:32.635872232Z
+_rfc3339 = re.compile(r'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:\.(\d+))?(Z|[+-]\d\d:\d\d)\Z')
+_epoch = date(1970, 1, 1)
+
+
+def group_entries_into_requests(unformatted_log_entries) -> (typing.List[dict], dict):
+    twenty_three_hours_ago = (
+        datetime.utcnow() - timedelta(hours=23)).timestamp() * 1000
+    requests = {}
+    log_group_counts = {}
+
+    for unformatted_entry in unformatted_log_entries:
+        log_entry = format_log_entry(unformatted_entry)
+        log_group = get_log_group(unformatted_entry)
+
+        if log_group not in requests:
+            log_group_counts[log_group] = {'filtered': 0, 'unfiltered': 0}
+            requests[log_group] = {
+                'logGroupName': log_group,
+                'logStreamName': 'default',
+                'logEvents': []
+            }
+
+        log_group_counts[log_group]['unfiltered'] += 1
+
+        if log_entry['timestamp'] > twenty_three_hours_ago and log_entry['message'] is not None:
+            log_group_counts[log_group]['filtered'] += 1
+            requests[log_group]['logEvents'].append(log_entry)
+
+    for log_group, request in requests.items():
+        request['logEvents'].sort(key=lambda r: r['timestamp'])
+
+    return [
+        {**request, 'logEvents': log_events}
+        for request in requests.values()
+        for log_events in split_log_events(request['logEvents'])
+    ], log_group_counts
+
+
+def format_log_entry(unformatted_log_entry) -> dict:
+    return {
+        'timestamp': timestamp_millis(unformatted_log_entry['timestamp']),
+        'message': get_log_message(unformatted_log_entry)
+    }
+
+
+def timestamp_millis(timestamp) -> int:
+    """Milliseconds since the epoch of a LogEntry timestamp.
+
+    RFC3339 timestamps are converted directly, truncating to the millisecond; anything else is left to dateutil.
+    """
+    match = _rfc3339.match(timestamp)
+    if match:
+        year, month, day, hours, minutes, seconds, fraction, offset = match.groups()
+        day_millis = _day_millis(int(year), int(month), int(day))
+        hours, minutes, seconds = int(hours), int(minutes), int(seconds)
+        if day_millis is not None and hours < 24 and minutes < 60 and seconds < 60:
+            millis = day_millis + ((hours * 60 + minutes) * 60 + seconds) * 1000
+            if fraction:
+                millis += int(fraction[:3].ljust(3, '0'))
+            if offset != 'Z':
+                offset_millis = (int(offset[1:3]) * 60 + int(offset[4:6])) * 60 * 1000
+                millis += -offset_millis if offset[0] == '+' else offset_millis
+            return millis
+    return int(dt_parse(timestamp).timestamp() * 1000)
+
+
+@lru_cache(maxsize=1024)
+def _day_millis(year, month, day):
+    try:
+        return (date(year, month, day) - _epoch).days * 24 * 60 * 60 * 1000
+    except ValueError:
+        return None
+
+
+def get_log_message(unformatted_log_entry):
+    if 'textPayload' in unformatted_log_entry:
+        return unformatted_log_entry['textPayload']
+    elif 'jsonPayload' in unformatted_log_entry:
+        # json.dumps, not the serializer's compact output, so metric filters and subscribers see the same text
+        return json.dumps(unformatted_log_entry['jsonPayload'])
+    elif 'protoPayload' in unformatted_log_entry:
+        return str(unformatted_log_entry['protoPayload'])
+
+
+def get_log_group(unformatted_log_entry) -> str:
+    resource = unformatted_log_entry['resource']
+    resource_type = resource['type']
+    labels = resource['labels']
+    resource_name_key = RESOURCE_NAME_LABELS.get(resource_type)
+    resource_name = labels[resource_name_key] if resource_name_key else None
+    return _log_group(labels['project_id'], resource_type, resource_name)
+
+
+@lru_cache(maxsize=4096)
+def _log_group(project_id, resource_type, resource_name):
+    resource_name_suffix = f"/{resource_name}" if resource_name is not None else ''
+    return f"/gcp/{project_id}/{resource_type}{resource_name_suffix}"
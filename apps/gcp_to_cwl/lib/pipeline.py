@@ -0,0 +1,93 @@
+import logging
+import queue
+import threading
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def pull_ahead(pull_client, batch_size) -> typing.Iterator[typing.Tuple[typing.List[dict], typing.List[str]]]:
+    """Yields the messages and ack ids of each batch pulled from a SynchronousPullClient, with the next pull already
+    in flight while the caller handles the current batch.
+
+    Stops after two consecutive pulls of less than batch_size messages, as `to_generator` does, but does not ack;
+    the caller acks each batch once it is delivered. A batch pulled ahead but never yielded, because the caller
+    stopped early, is not acked and is redelivered once its ack deadline passes.
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        low_poll_count = 0
+        pending = executor.submit(pull_client.pull, batch_size)
+        while pending is not None:
+            messages, ack_ids = pending.result()
+            if len(messages) < batch_size:
+                low_poll_count += 1
+            else:
+                low_poll_count = 0
+            pending = executor.submit(pull_client.pull, batch_size) if low_poll_count < 2 else None
+            if len(messages) > 0:
+                yield messages, ack_ids
+
+
+class BatchAcker:
+    """Acks Pub/Sub messages from a background thread, so acks do not hold up the next batch.
+
+    Ack ids queued while a request is outstanding are sent together in the next one, with at most `max_ack_ids`
+    per request. A failed ack is logged rather than raised, since the messages were delivered and are only
+    redelivered. Call close at the end of each invocation to wait for the remaining acks.
+    """
+
+    MAX_ACK_IDS = 2500
+    CLOSE_TIMEOUT = 30
+
+    def __init__(self, ack, max_ack_ids=MAX_ACK_IDS):
+        self.max_ack_ids = max_ack_ids
+        self.num_acked = 0
+        self.num_failed = 0
+        self._ack = ack
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def ack(self, ack_ids):
+        if ack_ids:
+            self._queue.put(list(ack_ids))
+
+    def close(self, timeout=CLOSE_TIMEOUT):
+        self._queue.put(None)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(f"Pub/Sub acks still pending after {timeout}s")
+
+    def _run(self):
+        closed = False
+        while not closed:
+            ack_ids = self._queue.get()
+            if ack_ids is None:
+                break
+            while True:
+                try:
+                    more_ack_ids = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more_ack_ids is None:
+                    closed = True
+                    break
+                ack_ids.extend(more_ack_ids)
+            for i in range(0, len(ack_ids), self.max_ack_ids):
+                self._send(ack_ids[i:i + self.max_ack_ids])
+
+    def _send(self, ack_ids):
+        try:
+            self._ack(ack_ids)
+            self.num_acked += len(ack_ids)
+        except Exception:
+            self.num_failed += len(ack_ids)
+            logger.exception(f"Failed to ack {len(ack_ids)} Pub/Sub messages, they will be redelivered")
@@ -1,8 +1,9 @@
-import json
 import typing
 from google.cloud import pubsub_v1
 from google.cloud.pubsub_v1.proto import pubsub_pb2
 
+import serializer
+
 
 class SynchronousPullClient:
 
@@ -14,7 +15,7 @@ class SynchronousPullClient:
     def _open_pull_envelope(envelope) -> typing.Tuple[typing.List[dict], typing.List[str]]:
         ack_ids = [m.ack_id for m in envelope.received_messages]
         messages = [
-            json.loads(str(m.message.data, 'utf-8'))
+            serializer.loads(m.message.data)
             for m in envelope.received_messages
         ]
         assert(len(ack_ids) == len(messages))
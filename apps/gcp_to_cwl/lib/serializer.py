@@ -0,0 +1,71 @@
+"""
+JSON encoding and decoding, backed by orjson when it is installed and by the standard library otherwise.
+
+`loads` accepts str or UTF-8 bytes. `dumps` returns compact JSON without ASCII escaping, which is the same text
+with either backend except for the exponent format of floats, and `dumps_bytes` returns it encoded as UTF-8.
+Set JSON_BACKEND=json in the environment to force the standard library.
+
+Each app is packaged from its own directory, so this module is copied into both firehose_to_es_processor and
+gcp_to_cwl; keep the two copies identical.
+"""
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None and os.environ.get('JSON_BACKEND', 'orjson') == 'orjson' else 'json'
+
+_encode_ascii_string = json.encoder.encode_basestring_ascii
+
+
+def _stdlib_loads(s):
+    return json.loads(s)
+
+
+def _stdlib_dumps(obj, default=None):
+    return json.dumps(obj, default=default, ensure_ascii=False, separators=(',', ':'))
+
+
+def _stdlib_dumps_bytes(obj, default=None):
+    return _stdlib_dumps(obj, default=default).encode('utf-8')
+
+
+def _orjson_loads(s):
+    try:
+        return orjson.loads(s)
+    except orjson.JSONDecodeError:
+        # orjson rejects NaN, integers wider than 64 bits and lone surrogates, which the standard library accepts
+        return json.loads(s)
+
+
+def _orjson_dumps(obj, default=None):
+    return _orjson_dumps_bytes(obj, default=default).decode('utf-8')
+
+
+def _orjson_dumps_bytes(obj, default=None):
+    try:
+        return orjson.dumps(obj, default=default)
+    except orjson.JSONEncodeError:
+        return _stdlib_dumps_bytes(obj, default=default)
+
+
+if BACKEND == 'orjson':
+    loads, dumps, dumps_bytes = _orjson_loads, _orjson_dumps, _orjson_dumps_bytes
+else:
+    loads, dumps, dumps_bytes = _stdlib_loads, _stdlib_dumps, _stdlib_dumps_bytes
+
+
+def dumps_compatible(value):
+    """Encodes value exactly as json.dumps(value) would.
+
+    Used where the encoded text itself is stored, such as the fields extracted from JSON log messages.
+    """
+    value_type = type(value)
+    if value_type is str:
+        return _encode_ascii_string(value)
+    if value_type is int:
+        return int.__repr__(value)
+    return json.dumps(value)
@@ -1,5 +1,9 @@
+import threading
 import time
 import functools
+from collections import Counter
+
+from botocore.exceptions import ClientError
 
 
 def eventually(timeout: float, interval: float, errors: set={AssertionError}):
@@ -25,3 +29,114 @@ def eventually(timeout: float, interval: float, errors: set={AssertionError}):
 
         return call
     return decorate
+
+
+class FakePubSub:
+    """
+    FakePubSub stands in for a SynchronousPullClient, serving messages in the order given and recording acks.
+    """
+    def __init__(self, messages, pull_delay: float=0.0):
+        self.messages = list(messages)
+        self.pull_delay = pull_delay
+        self.num_pulls = 0
+        self.acks = []
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def pull(self, batch_size):
+        time.sleep(self.pull_delay)
+        with self._lock:
+            self.num_pulls += 1
+            start, self._next = self._next, min(self._next + batch_size, len(self.messages))
+            return self.messages[start:self._next], [str(i) for i in range(start, self._next)]
+
+    def ack(self, ack_ids):
+        with self._lock:
+            self.acks.append(list(ack_ids))
+
+    @property
+    def acked_ids(self):
+        return [ack_id for ack_ids in self.acks for ack_id in ack_ids]
+
+
+class FakeLogsClient:
+    """
+    FakeLogsClient stands in for a boto3 CloudWatch Logs client, keeping the log groups and streams created and the
+    events put to each stream, checking sequence tokens the way the service does, and counting the calls made.
+    """
+    def __init__(self, streams=(), log_groups=(), put_delay: float=0.0, on_put=None):
+        self.log_groups = set(log_groups) | {log_group for log_group, _ in streams}
+        self.tokens = {stream: None for stream in streams}
+        self.events = {stream: [] for stream in streams}
+        self.put_delay = put_delay
+        self.on_put = on_put
+        self.num_puts = 0
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def create_log_group(self, logGroupName):
+        with self._lock:
+            self.calls['create_log_group'] += 1
+            if logGroupName in self.log_groups:
+                raise _client_error('ResourceAlreadyExistsException', 'The specified log group already exists')
+            self.log_groups.add(logGroupName)
+
+    def create_log_stream(self, logGroupName, logStreamName):
+        key = (logGroupName, logStreamName)
+        with self._lock:
+            self.calls['create_log_stream'] += 1
+            if logGroupName not in self.log_groups:
+                raise _client_error('ResourceNotFoundException', 'The specified log group does not exist.')
+            if key in self.tokens:
+                raise _client_error('ResourceAlreadyExistsException', 'The specified log stream already exists')
+            self.tokens[key] = None
+            self.events[key] = []
+
+    def delete_log_group(self, logGroupName):
+        with self._lock:
+            self.log_groups.discard(logGroupName)
+            for key in [key for key in self.tokens if key[0] == logGroupName]:
+                del self.tokens[key]
+
+    def get_paginator(self, operation_name):
+        assert operation_name == 'describe_log_streams'
+        return self
+
+    def paginate(self, logGroupName, logStreamNamePrefix):
+        with self._lock:
+            self.calls['describe_log_streams'] += 1
+            if logGroupName not in self.log_groups:
+                raise _client_error('ResourceNotFoundException', 'The specified log group does not exist.')
+            log_streams = []
+            for (log_group, log_stream), token in self.tokens.items():
+                if log_group == logGroupName and log_stream.startswith(logStreamNamePrefix):
+                    stream = {'logStreamName': log_stream}
+                    if token:
+                        stream['uploadSequenceToken'] = token
+                    log_streams.append(stream)
+            return [{'logStreams': log_streams}]
+
+    def put_log_events(self, logGroupName, logStreamName, logEvents, sequenceToken=None):
+        key = (logGroupName, logStreamName)
+        with self._lock:
+            self.calls['put_log_events'] += 1
+            if key not in self.tokens:
+                raise _client_error('ResourceNotFoundException', 'The specified log stream does not exist.')
+            expected_token = self.tokens[key]
+            if sequenceToken != expected_token:
+                raise _client_error(
+                    'InvalidSequenceTokenException',
+                    f"The given sequenceToken is invalid. The next expected sequenceToken is: {expected_token or 'null'}"
+                )
+            self.num_puts += 1
+        if self.on_put:
+            self.on_put(logGroupName, logStreamName, logEvents)
+        time.sleep(self.put_delay)
+        with self._lock:
+            self.tokens[key] = str(int(expected_token or 0) + 1)
+            self.events[key].extend(logEvents)
+            return {'nextSequenceToken': self.tokens[key]}
+
+
+def _client_error(code, message):
+    return ClientError({'Error': {'Code': code, 'Message': message}}, 'PutLogEvents')
@@ -12,6 +12,8 @@ from datetime import datetime
 from dateutil.parser import parse as dt_parse
 
 import app
+from cloudwatchlogs import CloudWatchLogs, SequenceTokenCache
+from test import FakeLogsClient, FakePubSub, eventually
 
 
 class TestApp(unittest.TestCase):
@@ -76,6 +78,15 @@ class TestApp(unittest.TestCase):
         ]
         self.assertEqual(result, expected)
 
+    def test_group_entries_into_requests_split(self):
+        recent_unformatted_log_entry = deepcopy(self.unformatted_log_entry)
+        recent_unformatted_log_entry['timestamp'] = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%f000Z')
+        recent_unformatted_log_entry['textPayload'] = 'a' * 300000
+        result, counts = app.group_entries_into_requests([recent_unformatted_log_entry] * 5)
+        self.assertEqual([len(request['logEvents']) for request in result], [3, 2])
+        self.assertEqual({request['logGroupName'] for request in result}, {'/gcp/cool-project/cloud_function/Fn1'})
+        self.assertEqual(counts['/gcp/cool-project/cloud_function/Fn1'], {'filtered': 5, 'unfiltered': 5})
+
     def test_get_log_group(self):
         self.assertEqual(
             app.get_log_group(self.unformatted_log_entry),
@@ -83,5 +94,55 @@ class TestApp(unittest.TestCase):
         )
 
 
+class TestProcessPipelined(unittest.TestCase):
+
+    log_group = '/gcp/cool-project/cloud_function/Fn1'
+
+    def _entries(self, n):
+        entries = []
+        for i in range(n):
+            entry = deepcopy(TestApp.unformatted_log_entry)
+            entry['timestamp'] = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%f000Z')
+            entry['textPayload'] = f"entry {i}"
+            entries.append(entry)
+        return entries
+
+    def test_process_pipelined(self):
+        pubsub = FakePubSub(self._entries(25))
+        logs_client = FakeLogsClient(streams=[(self.log_group, 'default')])
+        total = app.process_pipelined(pubsub, CloudWatchLogs(logs_client), 10, SequenceTokenCache())
+        self.assertEqual(total, 25)
+        messages = [event['message'] for event in logs_client.events[(self.log_group, 'default')]]
+        self.assertEqual(messages, [f"entry {i}" for i in range(25)])
+        self.assertEqual(sorted(pubsub.acked_ids, key=int), [str(i) for i in range(25)])
+
+    def test_pulls_while_putting(self):
+        pubsub = FakePubSub(self._entries(20))
+        pulls_during_puts = []
+
+        def on_put(log_group, log_stream, log_events):
+            @eventually(1.0, 0.01)
+            def next_pull_started():
+                self.assertGreater(pubsub.num_pulls, len(pulls_during_puts) + 1)
+            next_pull_started()
+            pulls_during_puts.append(pubsub.num_pulls)
+
+        logs_client = FakeLogsClient(streams=[(self.log_group, 'default')], on_put=on_put)
+        app.process_pipelined(pubsub, CloudWatchLogs(logs_client), 10, SequenceTokenCache())
+        self.assertEqual(pulls_during_puts, [2, 3])
+
+    def test_failed_put_is_not_acked(self):
+        pubsub = FakePubSub(self._entries(30))
+
+        def on_put(log_group, log_stream, log_events):
+            if log_events[0]['message'] == 'entry 10':
+                raise RuntimeError("CloudWatch Logs unavailable")
+
+        logs_client = FakeLogsClient(streams=[(self.log_group, 'default')], on_put=on_put)
+        with self.assertRaises(RuntimeError):
+            app.process_pipelined(pubsub, CloudWatchLogs(logs_client), 10, SequenceTokenCache())
+        self.assertEqual(pubsub.acked_ids, [str(i) for i in range(10)])
+
+
 if __name__ == '__main__':
     unittest.main()
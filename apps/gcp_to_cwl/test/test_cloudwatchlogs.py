@@ -5,14 +5,19 @@ import sys
 pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../lib'))  # noqa
 sys.path.insert(0, pkg_root)  # noqa
 
+import random
+import tempfile
+import threading
+import time
 import unittest
 import boto3
 import uuid
 from datetime import datetime
 from contextlib import contextmanager
-from cloudwatchlogs import CloudWatchLogs
+from cloudwatchlogs import CloudWatchLogs, SequenceTokenCache, split_log_events, EVENT_OVERHEAD, MAX_BATCH_BYTES, \
+    MAX_BATCH_EVENTS, MAX_BATCH_SPAN
 from botocore.exceptions import ClientError
-from test import eventually
+from test import FakeLogsClient, eventually
 
 
 class TestCloudWatchLogsClient(unittest.TestCase):
@@ -92,5 +97,238 @@ class TestCloudWatchLogsClient(unittest.TestCase):
             )
 
 
+class TestPutLogEventsConcurrently(unittest.TestCase):
+
+    class InFlight:
+
+        def __init__(self):
+            self.puts = {}
+            self.max_puts = 0
+            self.max_puts_per_stream = 0
+            self._lock = threading.Lock()
+
+        def on_put(self, log_group, log_stream, log_events):
+            with self._lock:
+                self.puts[log_group] = self.puts.get(log_group, 0) + 1
+                self.max_puts = max(self.max_puts, sum(self.puts.values()))
+                self.max_puts_per_stream = max(self.max_puts_per_stream, self.puts[log_group])
+            time.sleep(0.02)
+            with self._lock:
+                self.puts[log_group] -= 1
+
+    @staticmethod
+    def _request(log_group, *messages):
+        return {
+            'logGroupName': log_group,
+            'logStreamName': 'default',
+            'logEvents': [{'timestamp': 1, 'message': message} for message in messages]
+        }
+
+    def test_streams_in_parallel(self):
+        in_flight = self.InFlight()
+        log_groups = [f"group{i}" for i in range(10)]
+        client = FakeLogsClient(streams=[(log_group, 'default') for log_group in log_groups], on_put=in_flight.on_put)
+        requests = [self._request(log_group, j) for j in range(3) for log_group in log_groups]
+        cache = SequenceTokenCache()
+        responses = CloudWatchLogs(client).put_log_events_concurrently(requests, cache, max_concurrent_puts=4)
+        self.assertEqual(len(responses), 30)
+        self.assertGreater(in_flight.max_puts, 1)
+        self.assertLessEqual(in_flight.max_puts, 4)
+        self.assertEqual(in_flight.max_puts_per_stream, 1)
+        # every put had the right token, none was retried
+        self.assertEqual(client.num_puts, 30)
+        for log_group in log_groups:
+            self.assertEqual([event['message'] for event in client.events[(log_group, 'default')]], [0, 1, 2])
+            self.assertEqual(cache[f"{log_group}.default"], '3')
+
+    def test_sequential(self):
+        in_flight = self.InFlight()
+        client = FakeLogsClient(streams=[('group0', 'default'), ('group1', 'default')], on_put=in_flight.on_put)
+        requests = [self._request('group0', 'a'), self._request('group1', 'b')]
+        CloudWatchLogs(client).put_log_events_concurrently(requests, SequenceTokenCache(), max_concurrent_puts=1)
+        self.assertEqual(in_flight.max_puts, 1)
+        self.assertEqual(client.num_puts, 2)
+
+    def test_failed_stream(self):
+        def on_put(log_group, log_stream, log_events):
+            if log_group == 'group0':
+                raise RuntimeError("Throttled")
+
+        client = FakeLogsClient(streams=[(f"group{i}", 'default') for i in range(4)], on_put=on_put)
+        requests = [self._request(f"group{i}", 'a') for i in range(4)]
+        with self.assertRaises(RuntimeError):
+            CloudWatchLogs(client).put_log_events_concurrently(requests, SequenceTokenCache())
+        self.assertEqual(client.events[('group0', 'default')], [])
+        for i in range(1, 4):
+            self.assertEqual(len(client.events[(f"group{i}", 'default')]), 1)
+
+    def test_stream_lock(self):
+        cache = SequenceTokenCache()
+        self.assertIs(cache.stream_lock('group.default'), cache.stream_lock('group.default'))
+        self.assertIsNot(cache.stream_lock('group.default'), cache.stream_lock('other.default'))
+
+
+class TestSplitLogEvents(unittest.TestCase):
+
+    # one, two, three and four bytes per character in UTF-8
+    alphabet = 'ab \u00fc\u20ac\U0001F600'
+
+    @staticmethod
+    def _size(log_events):
+        return sum(len(event['message'].encode('utf-8')) + EVENT_OVERHEAD for event in log_events)
+
+    @staticmethod
+    def _span(log_events):
+        return log_events[-1]['timestamp'] - log_events[0]['timestamp']
+
+    def _random_log_events(self, rng, num_events):
+        timestamp = rng.randrange(10 ** 12)
+        log_events = []
+        for _ in range(num_events):
+            timestamp += rng.choice([0, 0, 1, 1000, 60 * 60 * 1000, 13 * 60 * 60 * 1000])
+            message = ''.join(rng.choice(self.alphabet) for _ in range(rng.randrange(200)))
+            log_events.append({'timestamp': timestamp, 'message': message})
+        return log_events
+
+    def _assert_valid_split(self, log_events, batches, max_bytes, max_events, max_span):
+        self.assertEqual([event for batch in batches for event in batch], log_events)
+        for i, batch in enumerate(batches):
+            self.assertGreater(len(batch), 0)
+            self.assertLessEqual(len(batch), max_events)
+            self.assertLessEqual(self._span(batch), max_span)
+            if len(batch) > 1:
+                self.assertLessEqual(self._size(batch), max_bytes)
+            if i + 1 < len(batches):
+                # the split is only made where the next event would not fit
+                extended = batch + batches[i + 1][:1]
+                self.assertTrue(
+                    len(extended) > max_events or
+                    self._size(extended) > max_bytes or
+                    self._span(extended) > max_span
+                )
+
+    def test_random_splits(self):
+        rng = random.Random(1048576)
+        for i in range(300):
+            log_events = self._random_log_events(rng, rng.randrange(100))
+            max_bytes = rng.randrange(EVENT_OVERHEAD, 5000)
+            max_events = rng.randrange(1, 50)
+            max_span = rng.choice([0, 1000, 24 * 60 * 60 * 1000])
+            with self.subTest(i=i, max_bytes=max_bytes, max_events=max_events, max_span=max_span):
+                batches = list(split_log_events(log_events, max_bytes, max_events, max_span))
+                self._assert_valid_split(log_events, batches, max_bytes, max_events, max_span)
+
+    def test_random_splits_default_limits(self):
+        rng = random.Random(10000)
+        log_events = self._random_log_events(rng, 25000)
+        batches = list(split_log_events(log_events))
+        self.assertGreater(len(batches), 1)
+        self._assert_valid_split(log_events, batches, MAX_BATCH_BYTES, MAX_BATCH_EVENTS, MAX_BATCH_SPAN)
+
+    def test_max_events(self):
+        log_events = [{'timestamp': 0, 'message': ''} for _ in range(MAX_BATCH_EVENTS + 1)]
+        self.assertEqual([len(batch) for batch in split_log_events(log_events)], [MAX_BATCH_EVENTS, 1])
+
+    def test_max_bytes(self):
+        # four events of exactly a quarter of the limit, counting three bytes for each euro sign
+        message = '\u20ac' * ((MAX_BATCH_BYTES // 4 - EVENT_OVERHEAD) // 3)
+        message += 'a' * (MAX_BATCH_BYTES // 4 - EVENT_OVERHEAD - len(message.encode('utf-8')))
+        log_events = [{'timestamp': 0, 'message': message} for _ in range(4)]
+        self.assertEqual([len(batch) for batch in split_log_events(log_events)], [4])
+        log_events[3] = {'timestamp': 0, 'message': message + 'a'}
+        self.assertEqual([len(batch) for batch in split_log_events(log_events)], [3, 1])
+
+    def test_max_span(self):
+        log_events = [{'timestamp': 0, 'message': 'a'}, {'timestamp': MAX_BATCH_SPAN, 'message': 'b'}]
+        self.assertEqual([len(batch) for batch in split_log_events(log_events)], [2])
+        log_events[1]['timestamp'] += 1
+        self.assertEqual([len(batch) for batch in split_log_events(log_events)], [1, 1])
+
+    def test_oversized_event(self):
+        log_events = [{'timestamp': 0, 'message': 'a' * MAX_BATCH_BYTES}, {'timestamp': 0, 'message': 'b'}]
+        self.assertEqual([len(batch) for batch in split_log_events(log_events)], [1, 1])
+
+    def test_no_events(self):
+        self.assertEqual(list(split_log_events([])), [])
+
+
+class TestSequenceTokenCache(unittest.TestCase):
+
+    request = {
+        'logGroupName': 'group',
+        'logStreamName': 'default',
+        'logEvents': [{'timestamp': 1, 'message': 'message'}]
+    }
+
+    def test_new_log_group(self):
+        client = FakeLogsClient()
+        cache = SequenceTokenCache()
+        CloudWatchLogs(client).put_log_events(self.request, cache)
+        self.assertEqual(len(client.events[('group', 'default')]), 1)
+        self.assertEqual(cache, {'group.default': '1'})
+        self.assertEqual(cache.log_groups, {'group'})
+
+    def test_warm_cache(self):
+        client = FakeLogsClient()
+        cache = SequenceTokenCache()
+        CloudWatchLogs(client).put_log_events(self.request, cache)
+        client.calls.clear()
+        CloudWatchLogs(client).put_log_events(self.request, cache)
+        self.assertEqual(client.calls, {'put_log_events': 1})
+
+    def test_existing_log_stream(self):
+        client = FakeLogsClient(streams=[('group', 'default')])
+        client.tokens[('group', 'default')] = '41'
+        cache = SequenceTokenCache()
+        CloudWatchLogs(client).put_log_events(self.request, cache)
+        self.assertEqual(client.calls, {'put_log_events': 2})
+        self.assertEqual(cache, {'group.default': '42'})
+
+    def test_existing_log_group(self):
+        client = FakeLogsClient(log_groups=['group'])
+        cache = SequenceTokenCache()
+        CloudWatchLogs(client).put_log_events(self.request, cache)
+        self.assertEqual(client.calls['create_log_group'], 0)
+        self.assertEqual(client.calls['create_log_stream'], 1)
+        self.assertEqual(len(client.events[('group', 'default')]), 1)
+
+    def test_known_log_group(self):
+        client = FakeLogsClient(log_groups=['group'])
+        cache = SequenceTokenCache()
+        cache.log_groups.add('group')
+        CloudWatchLogs(client).put_log_events(self.request, cache)
+        self.assertEqual(client.calls, {'put_log_events': 2, 'create_log_stream': 1})
+
+    def test_deleted_log_group(self):
+        client = FakeLogsClient()
+        cache = SequenceTokenCache()
+        CloudWatchLogs(client).put_log_events(self.request, cache)
+        client.delete_log_group('group')
+        CloudWatchLogs(client).put_log_events(self.request, cache)
+        self.assertEqual(client.events[('group', 'default')], self.request['logEvents'])
+        self.assertEqual(cache, {'group.default': '1'})
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'sequence_tokens.json')
+            self.assertEqual(SequenceTokenCache.load(path), {})
+            cache = SequenceTokenCache({'group.default': '3'})
+            cache.log_groups.add('group')
+            cache.save(path)
+            loaded = SequenceTokenCache.load(path)
+            self.assertEqual(loaded, {'group.default': '3'})
+            self.assertEqual(loaded.log_groups, {'group'})
+            self.assertEqual(os.listdir(directory), ['sequence_tokens.json'])
+
+    def test_load_unreadable(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as f:
+            f.write('{"sequence_tokens": ')
+            f.flush()
+            with self.assertLogs('cloudwatchlogs', level='WARNING'):
+                cache = SequenceTokenCache.load(f.name)
+        self.assertEqual(cache, {})
+        self.assertEqual(cache.log_groups, set())
+
+
 if __name__ == '__main__':
     unittest.main()
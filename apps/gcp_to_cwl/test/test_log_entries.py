@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+import os
+import sys
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../lib'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+import calendar
+import json
+import random
+import unittest
+from dateutil.parser import parse as dt_parse
+
+from log_entries import get_log_group, get_log_message, timestamp_millis
+
+
+class TestTimestampMillis(unittest.TestCase):
+
+    @staticmethod
+    def _dateutil_millis(timestamp):
+        parsed = dt_parse(timestamp)
+        return calendar.timegm(parsed.utctimetuple()) * 1000 + parsed.microsecond // 1000
+
+    def test_timestamp_millis(self):
+        cases = {
+            '2015-04-15T20:40:52.000000000Z': 1429130452000,
+            '2017-12-24T06:27:32.635872232Z': 1514096852635,
+            '2017-12-24T06:27:32.6Z': 1514096852600,
+            '2017-12-24T06:27:32Z': 1514096852000,
+            '2017-12-24T07:27:32.635+01:00': 1514096852635,
+            '2017-12-24T01:57:32.635-04:30': 1514096852635,
+            '1970-01-01T00:00:00Z': 0,
+            '2016-02-29T23:59:59.999999999Z': 1456790399999,
+        }
+        for timestamp, millis in cases.items():
+            with self.subTest(timestamp=timestamp):
+                self.assertEqual(timestamp_millis(timestamp), millis)
+                self.assertEqual(self._dateutil_millis(timestamp), millis)
+
+    def test_random_timestamps(self):
+        rand = random.Random(3339)
+        for _ in range(1000):
+            timestamp = '{:04d}-{:02d}-{:02d}T{:02d}:{:02d}:{:02d}{}{}'.format(
+                rand.randint(1971, 2037), rand.randint(1, 12), rand.randint(1, 28),
+                rand.randint(0, 23), rand.randint(0, 59), rand.randint(0, 59),
+                rand.choice(['', '.' + ''.join(rand.choice('0123456789') for _ in range(rand.randint(1, 9)))]),
+                rand.choice(['Z', '+00:00', '+05:30', '-08:00'])
+            )
+            with self.subTest(timestamp=timestamp):
+                self.assertEqual(timestamp_millis(timestamp), self._dateutil_millis(timestamp))
+
+    def test_fallback(self):
+        for timestamp in ['2017-12-24 06:27:32.635Z', '2017-12-24T06:27:32.635+0100', 'Dec 24 2017 06:27:32 UTC']:
+            with self.subTest(timestamp=timestamp):
+                self.assertEqual(timestamp_millis(timestamp), int(dt_parse(timestamp).timestamp() * 1000))
+
+    def test_invalid(self):
+        for timestamp in ['2017-02-30T06:27:32Z', '2017-12-24T24:27:32Z', 'yesterday']:
+            with self.subTest(timestamp=timestamp):
+                with self.assertRaises(ValueError):
+                    timestamp_millis(timestamp)
+
+
+class TestGetLogGroup(unittest.TestCase):
+
+    @staticmethod
+    def _entry(resource_type, **labels):
+        return {'resource': {'type': resource_type, 'labels': {'project_id': 'cool-project', **labels}}}
+
+    def test_get_log_group(self):
+        cases = [
+            (self._entry('gcs_bucket', bucket_name='bucket'), '/gcp/cool-project/gcs_bucket/bucket'),
+            (self._entry('cloud_function', function_name='Fn1'), '/gcp/cool-project/cloud_function/Fn1'),
+            (self._entry('cloud_function', function_name='Fn2'), '/gcp/cool-project/cloud_function/Fn2'),
+            (self._entry('gae_app', module_id='default'), '/gcp/cool-project/gae_app/default'),
+            (self._entry('container', container_name='web'), '/gcp/cool-project/container/web'),
+            (self._entry('gce_instance', instance_id='1234'), '/gcp/cool-project/gce_instance'),
+        ]
+        # twice, the second time from the cache
+        for _ in range(2):
+            for entry, log_group in cases:
+                with self.subTest(log_group=log_group):
+                    self.assertEqual(get_log_group(entry), log_group)
+
+
+class TestGetLogMessage(unittest.TestCase):
+
+    def test_json_payload(self):
+        payload = {'message': 'caf\u00e9 \u2603', 'status': 200, 'nested': {'ok': True}}
+        message = get_log_message({'jsonPayload': payload})
+        # the same text as json.dumps, which metric filters on the log groups may depend on
+        self.assertEqual(message, '{"message": "caf\\u00e9 \\u2603", "status": 200, "nested": {"ok": true}}')
+        self.assertEqual(message, json.dumps(payload))
+
+    def test_text_payload(self):
+        self.assertEqual(get_log_message({'textPayload': 'hello'}), 'hello')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+import os
+import sys
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../lib'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+import threading
+import unittest
+
+from pipeline import BatchAcker, pull_ahead
+from test import FakePubSub, eventually
+
+
+class TestPullAhead(unittest.TestCase):
+
+    def test_batches(self):
+        pubsub = FakePubSub(range(25))
+        batches = list(pull_ahead(pubsub, 10))
+        self.assertEqual(
+            [messages for messages, _ in batches],
+            [list(range(10)), list(range(10, 20)), list(range(20, 25))]
+        )
+        self.assertEqual([ack_ids for _, ack_ids in batches][1], [str(i) for i in range(10, 20)])
+        # stops after the second short pull, which came back empty
+        self.assertEqual(pubsub.num_pulls, 4)
+        self.assertEqual(pubsub.acks, [])
+
+    def test_next_pull_in_flight(self):
+        pubsub = FakePubSub(range(30))
+        batches = pull_ahead(pubsub, 10)
+        next(batches)
+
+        @eventually(1.0, 0.01)
+        def next_pull_started():
+            self.assertEqual(pubsub.num_pulls, 2)
+        next_pull_started()
+        batches.close()
+
+    def test_empty_subscription(self):
+        pubsub = FakePubSub([])
+        self.assertEqual(list(pull_ahead(pubsub, 10)), [])
+        self.assertEqual(pubsub.num_pulls, 2)
+
+
+class TestBatchAcker(unittest.TestCase):
+
+    def test_ack(self):
+        pubsub = FakePubSub([])
+        with BatchAcker(pubsub.ack, max_ack_ids=3) as acker:
+            acker.ack(['0', '1'])
+            acker.ack([])
+            acker.ack(['2', '3', '4', '5'])
+        self.assertEqual(pubsub.acked_ids, ['0', '1', '2', '3', '4', '5'])
+        self.assertTrue(all(0 < len(ack_ids) <= 3 for ack_ids in pubsub.acks))
+        self.assertEqual(acker.num_acked, 6)
+
+    def test_batches_pending_acks(self):
+        pubsub = FakePubSub([])
+        unblock = threading.Event()
+
+        def ack(ack_ids):
+            unblock.wait(5)
+            pubsub.ack(ack_ids)
+
+        with BatchAcker(ack) as acker:
+            acker.ack(['0'])
+            acker.ack(['1'])
+            acker.ack(['2'])
+            unblock.set()
+        self.assertEqual(pubsub.acked_ids, ['0', '1', '2'])
+        self.assertLessEqual(len(pubsub.acks), 2)
+
+    def test_failed_ack(self):
+        def ack(ack_ids):
+            raise RuntimeError("Pub/Sub unavailable")
+
+        with self.assertLogs('pipeline', level='ERROR'):
+            with BatchAcker(ack) as acker:
+                acker.ack(['0', '1'])
+        self.assertEqual(acker.num_failed, 2)
+        self.assertEqual(acker.num_acked, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+import os
+import sys
+
+pkg_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../lib'))  # noqa
+sys.path.insert(0, pkg_root)  # noqa
+
+import json
+import unittest
+
+import serializer
+
+
+class TestSerializer(unittest.TestCase):
+
+    payloads = [
+        {'message': 'hello', 'severity': 'INFO', 'count': 3, 'ratio': 0.25, 'ok': True, 'extra': None},
+        {'nested': {'list': [1, 'two', {'three': 3}]}, 'unicode': 'café ☃ \U0001F600'},
+        {'escapes': 'quote " backslash \\ newline \n'},
+    ]
+
+    def test_loads_bytes(self):
+        for payload in self.payloads:
+            with self.subTest(payload=payload):
+                self.assertEqual(serializer.loads(json.dumps(payload).encode('utf-8')), payload)
+
+    def test_dumps_round_trip(self):
+        for payload in self.payloads:
+            with self.subTest(payload=payload):
+                self.assertEqual(json.loads(serializer.dumps(payload)), payload)
+                self.assertEqual(serializer.dumps(payload), serializer._stdlib_dumps(payload))
+
+
+if __name__ == '__main__':
+    unittest.main()
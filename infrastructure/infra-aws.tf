@@ -351,6 +351,8 @@ resource "aws_s3_bucket_notification" "bucket_notification" {
     lambda_function_arn = "arn:aws:lambda:us-east-1:${var.account_id}:function:Firehose-CWL-Processor"
     events = [
       "s3:ObjectCreated:*"]
+    // only files delivered by firehose, not the processor's dead letters
+    filter_prefix = "firehose"
   }
 }
 
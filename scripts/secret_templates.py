@@ -57,10 +57,25 @@ secret_templates = {
         'airbrake_enabled': True,
         'airbrake_api_key': 'DEFINE',
         'airbrake_project_id': 1010101,
-        'airbrake_environment': 'DEFINE'
+        'airbrake_environment': 'DEFINE',
+        'es_bulk_max_bytes': 10000000,
+        'es_bulk_max_docs': 10000,
+        'es_bulk_concurrency': 2,
+        'es_document_id': 'hash',
+        'es_op_type': 'create',
+        'es_dead_letter_prefix': 'dead-letter/',
+        'file_concurrency': 2,
+        's3_prefetch_part_size': 8388608,
+        's3_prefetch_depth': 4,
+        'transform_processes': 0,
+        'metrics_publisher': 'emf',
+        'stage_metrics_enabled': False
     },
     'logs/_/gcp_to_cwl.json': {
-        'gcp_exporter_google_application_credentials': dict()
+        'gcp_exporter_google_application_credentials': dict(),
+        'pipelined': True,
+        'max_concurrent_puts': 8,
+        'sequence_token_cache_file': '/tmp/gcp_to_cwl_sequence_tokens.json'
     },
     'logs/_/log_retention_policy_enforcer.json': {
         'log_retention_ttls': {